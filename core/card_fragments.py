@@ -0,0 +1,32 @@
+# Archivo: core/card_fragments.py
+
+import json
+from django.template.loader import render_to_string
+
+def _render_fragment(card):
+    html = render_to_string('core/partials/content_card.html', {'item': card})
+    return html, json.dumps(html, ensure_ascii=False)[1:-1]
+
+def get_card_fragments(cards):
+    """
+    Fragmentos HTML de las tarjetas, renderizados una sola vez por tarjeta. Se guardan en
+    la propia Card, que pertenece a una sola versión del catálogo: una recarga a mitad de
+    la petición no puede mezclar el HTML de una versión con la otra.
+    Devuelve una lista de pares (html, html escapado para JSON).
+    """
+    result = []
+    for card in cards:
+        fragment = getattr(card, 'fragment', None)
+        if fragment is None:
+            # Dos hilos pueden renderizar la misma tarjeta a la vez; el resultado es idéntico.
+            fragment = card.fragment = _render_fragment(card)
+        result.append(fragment)
+    return result
+
+def render_cards_html(cards):
+    """HTML de una lista de tarjetas: la unión de sus fragmentos cacheados."""
+    return ''.join(html for html, _ in get_card_fragments(cards))
+
+def render_cards_json(cards):
+    """El mismo HTML ya escapado como cadena JSON (con comillas), para /cargar-mas/."""
+    return '"' + ''.join(escaped for _, escaped in get_card_fragments(cards)) + '"'
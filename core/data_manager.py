@@ -1,61 +1,851 @@
 # Archivo: core/data_manager.py (CORREGIDO)
 
+import os
+import stat
 import json
+import base64
+import time
+import pickle
+import tempfile
+import heapq
+import bisect
+import hashlib
+import threading
 import requests
+from pathlib import Path
+from collections import OrderedDict
+from urllib.parse import urljoin
+from types import MappingProxyType
+from concurrent.futures import ThreadPoolExecutor
 from functools import lru_cache
 from django.conf import settings
+from django.urls import reverse
+
+from . import search
+from . import facets
+from .sources import group_sources_by_lang
+from .seo import build_keyword_paragraph, build_meta_description
+
+# --- SESIÓN HTTP COMPARTIDA PARA LOS RAWS ---
+
+_http_session = None
+
+def _get_http_session():
+    """
+    Devuelve una única sesión de requests (keep-alive) para todas las descargas de raws,
+    así las conexiones TLS con raw.githubusercontent.com se reutilizan.
+    """
+    global _http_session
+    if _http_session is None:
+        pool_size = max(len(settings.GITHUB_RAW_URLS), 4)
+        adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        session = requests.Session()
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        _http_session = session
+    return _http_session
+
+# --- FUENTES DEL CATÁLOGO: RAWS COMPLETOS O MANIFIESTO FRAGMENTADO ---
+
+# Clave del manifiesto en la caché de raws (solo en modo fragmentado).
+MANIFEST_KEY = 'manifest'
+
+def _get_manifest_url():
+    """URL del manifiesto del catálogo fragmentado; None para usar los raws completos."""
+    return getattr(settings, 'CATALOG_MANIFEST_URL', None)
+
+_parsed_manifest = (None, {})
+
+def _build_shard_index(manifest):
+    """
+    {tipo: ((min_id, max_id, url, digest), ...)} ordenado por min_id para localizar
+    fragmentos con bisect. digest es el del contenido del fragmento (None en manifiestos antiguos).
+    """
+    shard_index = {'movies': [], 'series': [], 'anime': []}
+    for shard in manifest.get('shards', []):
+        if shard.get('type') in shard_index:
+            shard_index[shard['type']].append((shard['min_id'], shard['max_id'], urljoin(_get_manifest_url(), shard['url']), shard.get('digest')))
+    return {content_type: tuple(sorted(ranges)) for content_type, ranges in shard_index.items()}
+
+def _get_manifest():
+    """Manifiesto en caché ya parseado (se parsea una vez por versión del manifiesto)."""
+    global _parsed_manifest
+    entry = _raw_cache.get(MANIFEST_KEY)
+    if not entry or entry['body'] is None:
+        return {}
+    if _parsed_manifest[0] != entry['digest']:
+        manifest = _parse_manifest_body(entry['body'])
+        manifest['shard_index'] = _build_shard_index(manifest)
+        _parsed_manifest = (entry['digest'], manifest)
+    return _parsed_manifest[1]
+
+def _get_source_urls():
+    """
+    Fuentes de datos del catálogo {clave: url}: los raws de GITHUB_RAW_URLS o, en modo
+    fragmentado, los listados que indica el manifiesto (solo tarjetas, sin fichas).
+    """
+    manifest_url = _get_manifest_url()
+    if not manifest_url:
+        return dict(settings.GITHUB_RAW_URLS)
+    listing = _get_manifest().get('listing', [])
+    return {f"listing{i}": urljoin(manifest_url, url) for i, url in enumerate(listing, 1)}
+
+def _get_source_url(raw_key):
+    if raw_key == MANIFEST_KEY:
+        return _get_manifest_url()
+    return _get_source_urls()[raw_key]
+
+def _get_raw_timeout(raw_key):
+    """Timeout (conexión, lectura) de un raw: el específico si existe, si no el general."""
+    timeouts = getattr(settings, 'GITHUB_RAW_TIMEOUTS', {})
+    return timeouts.get(raw_key, getattr(settings, 'GITHUB_RAW_TIMEOUT', 10))
+
+def _empty_data():
+    return {"movies": [], "series": [], "anime": []}
+
+def _parse_raw_body(body):
+    """Parsea el JSON de un raw garantizando las tres listas."""
+    data = json.loads(body)
+    if 'movies' not in data: data['movies'] = []
+    if 'series' not in data: data['series'] = []
+    if 'anime' not in data: data['anime'] = []
+    return data
+
+def _parse_manifest_body(body):
+    """
+    Parsea el manifiesto del catálogo fragmentado:
+    {"listing": [url, ...], "shards": [{"url", "type", "min_id", "max_id", "digest"}, ...]}
+    """
+    manifest = json.loads(body)
+    if not isinstance(manifest, dict) or not isinstance(manifest.get('listing'), list):
+        raise json.JSONDecodeError("El manifiesto no tiene la lista 'listing'", '', 0)
+    manifest.setdefault('shards', [])
+    return manifest
+
+def _fetch_raw(raw_key, etag=None):
+    """
+    Descarga y parsea un raw. A diferencia de get_data_from_raw, propaga los errores
+    para que quien llama pueda saber qué fuente falló.
+    Si se pasa el ETag anterior hace una petición condicional: cuando GitHub responde
+    304 devuelve data=None. Devuelve (data, etag, digest, body).
+    """
+    url = _get_source_url(raw_key)
+    headers = {'If-None-Match': etag} if etag else {}
+    print(f"Fetching data from GitHub ({raw_key}): {url}")
+    response = _get_http_session().get(url, timeout=_get_raw_timeout(raw_key), headers=headers)
+    if response.status_code == 304:
+        return None, etag, None, None
+    response.raise_for_status()
+    body = response.content
+    data = _parse_manifest_body(body) if raw_key == MANIFEST_KEY else _parse_raw_body(body)
+    # El digest identifica el contenido aunque el servidor no mande ETag.
+    digest = hashlib.sha1(body).hexdigest()[:12]
+    return data, response.headers.get('ETag'), digest, body
+
+# --- CACHÉ DE RAWS CON TTL Y REVALIDACIÓN POR ETAG ---
+
+# raw_key -> {'body', 'etag', 'digest', 'expires_at', 'error'}
+# Se guarda el JSON tal cual llega (bytes), que ocupa mucho menos que los dicts
+# parseados; solo se vuelve a parsear cuando hay que reconstruir el catálogo.
+_raw_cache = {}
+# Serializa las recargas: una sola petición a GitHub por raw caducado a la vez.
+_refresh_lock = threading.RLock()
+
+def _get_cache_ttl():
+    return getattr(settings, 'CATALOG_CACHE_TTL', 300)
+
+def _get_negative_ttl():
+    return getattr(settings, 'CATALOG_NEGATIVE_TTL', 30)
+
+def _is_expired(entry):
+    return entry is None or time.monotonic() >= entry['expires_at']
+
+def _refresh_raw(raw_key):
+    """
+    Revalida un raw caducado y actualiza su entrada en _raw_cache.
+    - 200: guarda los datos nuevos durante CATALOG_CACHE_TTL.
+    - 304: conserva los datos y renueva el TTL sin descargar nada.
+    - Error: conserva los últimos datos buenos (o vacíos si nunca los hubo) y
+      vuelve a intentarlo pasados CATALOG_NEGATIVE_TTL segundos.
+    Devuelve (entry, status, segundos, data), con data solo si hubo descarga nueva.
+    """
+    previous = _raw_cache.get(raw_key)
+    start = time.monotonic()
+    data = None
+    try:
+        data, etag, digest, body = _fetch_raw(raw_key, previous['etag'] if previous and previous['body'] is not None else None)
+        if data is None:
+            entry = dict(previous, expires_at=time.monotonic() + _get_cache_ttl(), error=None)
+            status = 'sin_cambios'
+        else:
+            entry = {'body': body, 'etag': etag, 'digest': digest, 'expires_at': time.monotonic() + _get_cache_ttl(), 'error': None}
+            status = 'ok'
+    except (requests.RequestException, json.JSONDecodeError) as e:
+        print(f"FATAL: Could not fetch or parse data from {_get_source_url(raw_key)}. Error: {e}")
+        if previous and previous['body'] is not None:
+            entry = dict(previous, expires_at=time.monotonic() + _get_negative_ttl(), error=str(e))
+        else:
+            entry = {'body': None, 'etag': None, 'digest': None, 'expires_at': time.monotonic() + _get_negative_ttl(), 'error': str(e)}
+        status = 'fallo'
+    _raw_cache[raw_key] = entry
+    return entry, status, time.monotonic() - start, data
+
+def _entry_data(entry):
+    return _parse_raw_body(entry['body']) if entry['body'] is not None else _empty_data()
 
 # --- FUNCIONES DE CACHÉ INDIVIDUALES PARA CADA RAW ---
 
-@lru_cache(maxsize=3)
 def get_data_from_raw(raw_key):
     """
     Función genérica para obtener y parsear un JSON desde una URL de GitHub.
+    Usa la caché con TTL: solo vuelve a GitHub cuando la entrada ha caducado.
+    Cada llamada devuelve un parseo nuevo; las vistas deben usar el catálogo.
     """
-    if raw_key not in settings.GITHUB_RAW_URLS:
+    if raw_key not in _get_source_urls():
         print(f"FATAL: La clave '{raw_key}' no se encuentra en GITHUB_RAW_URLS en settings.py.")
-        return {"movies": [], "series": [], "anime": []}
-        
-    url = settings.GITHUB_RAW_URLS[raw_key]
-    print(f"Fetching data from GitHub ({raw_key}): {url}")
+        return _empty_data()
+
+    entry = _raw_cache.get(raw_key)
+    if _is_expired(entry):
+        with _refresh_lock:
+            entry = _raw_cache.get(raw_key)
+            if _is_expired(entry):
+                entry, _, _, _ = _refresh_raw(raw_key)
+    return _entry_data(entry)
+
+# --- CARGA CONCURRENTE DE TODOS LOS RAWS ---
+
+_last_load_report = {}
+
+def _raws_expired():
+    """True si algún raw configurado (o el manifiesto) no está en caché o ya caducó."""
+    if _get_manifest_url() and _is_expired(_raw_cache.get(MANIFEST_KEY)):
+        return True
+    return any(_is_expired(_raw_cache.get(raw_key)) for raw_key in _get_source_urls())
+
+def _revalidate_raws():
+    """
+    Revalida en paralelo, sobre la sesión compartida, los raws de GITHUB_RAW_URLS
+    (o, en modo fragmentado, el manifiesto y después sus listados) que hayan
+    caducado; los que siguen vigentes no generan ninguna petición.
+    Devuelve {raw_key: data} solo con los raws que se descargaron de nuevo.
+    Deja en _last_load_report el estado de cada fuente
+    ('ok', 'sin_cambios', 'cache', 'lento' o 'fallo').
+    """
+    global _last_load_report
+    with _refresh_lock:
+        start = time.monotonic()
+        results = {}
+        # El manifiesto va primero porque de él salen las URLs de los listados.
+        if _get_manifest_url() and _is_expired(_raw_cache.get(MANIFEST_KEY)):
+            results[MANIFEST_KEY] = _refresh_raw(MANIFEST_KEY)
+
+        raw_keys = list(_get_source_urls().keys())
+        expired_keys = [raw_key for raw_key in raw_keys if _is_expired(_raw_cache.get(raw_key))]
+        slow_seconds = getattr(settings, 'GITHUB_RAW_SLOW_SECONDS', 3)
+        if expired_keys:
+            with ThreadPoolExecutor(max_workers=len(expired_keys), thread_name_prefix='raw-fetch') as pool:
+                results.update(zip(expired_keys, pool.map(_refresh_raw, expired_keys)))
+
+        fresh_datas, report = {}, {}
+        for raw_key in ([MANIFEST_KEY] if MANIFEST_KEY in results else []) + raw_keys:
+            if raw_key not in results:
+                report[raw_key] = {'status': 'cache', 'seconds': 0.0, 'error': None}
+                continue
+            entry, status, seconds, data = results[raw_key]
+            if status != 'fallo' and seconds > slow_seconds:
+                print(f"ADVERTENCIA: El raw {raw_key} respondió lento ({seconds:.2f}s).")
+                status = 'lento'
+            report[raw_key] = {'status': status, 'seconds': seconds, 'error': entry['error']}
+            if data is not None and raw_key != MANIFEST_KEY:
+                fresh_datas[raw_key] = data
+
+        _last_load_report = report
+        if results:
+            summary = ', '.join(f"{key}={info['status']} ({info['seconds']:.2f}s)" for key, info in report.items())
+            print(f"Raws cargados en {time.monotonic() - start:.2f}s: {summary}")
+        return fresh_datas
+
+def _collect_raw_datas(fresh_datas):
+    """{raw_key: data} de todos los raws: los recién descargados y el resto parseado de la caché."""
+    return {
+        raw_key: fresh_datas[raw_key] if raw_key in fresh_datas else _entry_data(_raw_cache[raw_key])
+        for raw_key in _get_source_urls()
+    }
+
+def load_all_raws():
+    """
+    Revalida los raws caducados (en paralelo) y devuelve {raw_key: data} de todos.
+    Los raws que fallan sin datos previos se sustituyen por datos vacíos.
+    """
+    return _collect_raw_datas(_revalidate_raws())
+
+def get_load_report():
+    """Estado de cada raw en la última carga (útil para saber qué fuente fue lenta o falló)."""
+    return dict(_last_load_report)
+
+def compute_catalog_version():
+    """Versión del catálogo derivada del contenido de los raws: cambia solo si cambia algún archivo."""
+    raw_keys = ([MANIFEST_KEY] if _get_manifest_url() else []) + list(_get_source_urls())
+    digests = [f"{raw_key}:{(_raw_cache.get(raw_key) or {}).get('digest')}" for raw_key in raw_keys]
+    return hashlib.sha1('|'.join(digests).encode()).hexdigest()[:12]
+
+# --- TARJETAS LIGERAS Y FICHAS COMPLETAS BAJO DEMANDA ---
+
+def _audio_languages(item):
+    """Idiomas de audio disponibles en las fuentes de un item (película o episodios)."""
+    languages = {source.get('language') for source in item.get('sources', [])}
+    for season in item.get('seasons', []):
+        for episode in season.get('episodes', []):
+            languages.update(source.get('language') for source in episode.get('sources', []))
+    languages.discard(None)
+    return sorted(languages)
+
+class Card:
+    """
+    Proyección ligera de un item: solo lo que necesitan los listados, los filtros y la ordenación.
+    La ficha completa (temporadas, fuentes, sinopsis, reparto...) se guarda aparte
+    serializada y se decodifica solo cuando una vista de detalle la pide.
+    """
+    FIELDS = ('id', 'title', 'original_title', 'type', 'poster_path', 'release_date', 'genres', 'languages')
+    # 'fragment' guarda el HTML de la tarjeta (core/card_fragments.py) la primera vez que se pinta;
+    # no se persiste en el snapshot porque depende de las plantillas del despliegue.
+    PICKLED_SLOTS = FIELDS + ('sort_key', 'card_json')
+    __slots__ = PICKLED_SLOTS + ('fragment',)
+
+    def __init__(self, item):
+        self.id = item.get('id')
+        self.title = item.get('title', '')
+        self.original_title = item.get('original_title')
+        self.type = item.get('type')
+        self.poster_path = item.get('poster_path')
+        self.release_date = item.get('release_date')
+        self.genres = tuple(item.get('genres') or ())
+        # Los listados del modo fragmentado ya traen los idiomas; si no, se sacan de las fuentes.
+        languages = item.get('languages')
+        self.languages = tuple(languages if languages is not None else _audio_languages(item))
+        # Orden total (fecha, tipo, id): permite paginar por cursor sin ambigüedad en
+        # las fechas repetidas. Las fechas None cuentan como muy antiguas.
+        self.sort_key = (self.release_date or '1900-01-01', self.type or '', self.id if isinstance(self.id, int) else -1)
+        # JSON de la tarjeta para las sugerencias del buscador, serializado una sola vez por catálogo.
+        self.card_json = json.dumps(self.as_card(), ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+    def __getstate__(self):
+        return None, {slot: getattr(self, slot) for slot in self.PICKLED_SLOTS}
+
+    def as_dict(self):
+        return {field: getattr(self, field) for field in self.FIELDS}
+
+    def as_card(self):
+        """Esquema de tarjeta de las sugerencias del buscador (id, title, type, url, poster)."""
+        if self.type == 'Película': url_name = 'movie_detail'
+        elif self.type == 'Anime': url_name = 'anime_detail'
+        else: url_name = 'series_detail'
+        poster = None
+        if self.poster_path:
+            poster = self.poster_path if 'http' in self.poster_path else f"https://image.tmdb.org/t/p/w500{self.poster_path}"
+        return {'id': self.id, 'title': self.title, 'type': self.type or 'Película', 'url': reverse(url_name, args=[self.id]), 'poster': poster}
+
+    def __repr__(self):
+        return f"<Card {self.type} {self.id}: {self.title}>"
+
+# Fichas decodificadas que se mantienen en memoria (las más visitadas).
+DETAIL_CACHE_SIZE = 256
+
+def _episode_url_template(item):
+    """URL de episodio de la serie con {season}/{episode} por rellenar (un solo reverse por serie)."""
+    url_name = 'anime_episode_player' if item.get('type') == 'Anime' else 'series_episode_player'
+    url = reverse(url_name, args=[item['id'], 987654321, 987654322])
+    return url.replace('987654321', '{season}').replace('987654322', '{episode}')
+
+def _build_episode_nav(item):
+    """
+    {(temporada, episodio): (pos. temporada, pos. episodio, url anterior, url siguiente)}
+    en el orden de las temporadas y episodios del JSON. Si un episodio se repite manda
+    la primera aparición, como en la búsqueda lineal que reemplaza.
+    """
+    flat = []
+    for season_pos, season in enumerate(item.get('seasons') or []):
+        for episode_pos, episode in enumerate(season.get('episodes') or []):
+            flat.append((season.get('season_number'), episode.get('episode_number'), season_pos, episode_pos))
+    if not flat:
+        return {}
+
+    url_template = _episode_url_template(item)
+    urls = [url_template.format(season=season_number, episode=episode_number) for season_number, episode_number, _, _ in flat]
+    episode_nav = {}
+    for i, (season_number, episode_number, season_pos, episode_pos) in enumerate(flat):
+        if (season_number, episode_number) not in episode_nav:
+            prev_url = urls[i - 1] if i > 0 else None
+            next_url = urls[i + 1] if i < len(flat) - 1 else None
+            episode_nav[(season_number, episode_number)] = (season_pos, episode_pos, prev_url, next_url)
+    return episode_nav
+
+def _prepare_detail(item):
+    """
+    Añade a una copia de la ficha lo que se precalcula al construir el catálogo: las
+    fuentes agrupadas por idioma y ordenadas (de la película y de cada episodio), la
+    navegación de episodios y los textos SEO (descripción, palabras clave, URL canónica).
+    """
+    prepared = dict(item)
+    prepared['meta_description'] = build_meta_description(item)
+    prepared['keyword_paragraph_html'] = build_keyword_paragraph(item.get('title'), item.get('type'))
+    if item.get('id') is not None:
+        if item.get('type') == 'Película': detail_url_name = 'movie_detail'
+        elif item.get('type') == 'Anime': detail_url_name = 'anime_detail'
+        else: detail_url_name = 'series_detail'
+        prepared['canonical_path'] = reverse(detail_url_name, args=[item['id']])
+    if 'sources' in item:
+        prepared['sources_by_lang'] = group_sources_by_lang(item['sources'])
+    if item.get('seasons'):
+        prepared['seasons'] = [
+            dict(season, episodes=[dict(episode, sources_by_lang=group_sources_by_lang(episode.get('sources'))) for episode in season.get('episodes') or []])
+            if season.get('episodes') else season
+            for season in item['seasons']
+        ]
+        if item.get('id') is not None:
+            prepared['episode_nav'] = _build_episode_nav(item)
+    return prepared
+
+def _encode_detail(item):
+    return pickle.dumps(_prepare_detail(item), protocol=pickle.HIGHEST_PROTOCOL)
+
+@lru_cache(maxsize=DETAIL_CACHE_SIZE)
+def _decode_detail(blob):
+    """
+    Decodifica una ficha. El dict devuelto se comparte entre peticiones mientras siga
+    en la caché, así que las vistas no deben modificarlo.
+    """
+    return pickle.loads(blob)
+
+def _index_by_id(pairs, index=None):
+    """
+    Añade pares (id, ficha) a un diccionario id→ficha. Si un ID se repite se conserva
+    el primero, igual que hacía la búsqueda lineal.
+    """
+    if index is None:
+        index = {}
+    for item_id, blob in pairs:
+        if item_id is not None and item_id not in index:
+            index[item_id] = blob
+    return index
+
+# --- VISTAS ORDENADAS POR FECHA ---
+
+def _release_date_key(card):
+    """Clave de ordenación por fecha de estreno (desempatando por tipo e id)."""
+    return card.sort_key
+
+def _sorted_by_release_date(cards):
+    return sorted(cards, key=_release_date_key, reverse=True)
+
+def _merge_sorted(*sorted_lists):
+    """
+    Mezcla listas ya ordenadas (de más reciente a más antigua). Ante claves iguales
+    respeta el orden de las listas, igual que sorted() sobre la concatenación.
+    """
+    return tuple(heapq.merge(*sorted_lists, key=_release_date_key, reverse=True))
+
+# --- CONSTRUCCIÓN DEL CATÁLOGO ---
+
+def build_catalog(raw_datas, version=None, with_details=None):
+    """
+    Construye en un solo paso, a partir de {raw_key: data}, las tarjetas por tipo,
+    los índices id→ficha y las vistas ordenadas por fecha.
+    En modo fragmentado (with_details=False) los datos son listados sin fichas y los
+    índices quedan vacíos: las fichas se piden a su fragmento bajo demanda.
+    El resultado es un snapshot inmutable (tuplas y mappings de solo lectura), así
+    que puede compartirse entre hilos mientras se construye el siguiente.
+    """
+    if with_details is None:
+        with_details = not _get_manifest_url()
+    cards = {'movies': [], 'series': [], 'anime': []}
+    details = {'movies': [], 'series': [], 'anime': []}
+    sorted_per_type = {'movies': [], 'series': [], 'anime': []}
+    for data in raw_datas.values():
+        for content_type in cards:
+            raw_cards = []
+            for item in data.get(content_type, []):
+                card = Card(item)
+                raw_cards.append(card)
+                if with_details:
+                    details[content_type].append((card.id, _encode_detail(item)))
+            cards[content_type].extend(raw_cards)
+            # Cada raw se ordena por separado y luego se mezclan las listas ya ordenadas.
+            sorted_per_type[content_type].append(_sorted_by_release_date(raw_cards))
+
+    movies_by_id = _index_by_id(details['movies'])
+    # Series y animes comparten las URLs de detalle/episodio, así que se buscan juntos.
+    shows_by_id = _index_by_id(details['series'] + details['anime'])
+    content_by_id = _index_by_id(details['series'] + details['anime'], dict(movies_by_id))
+
+    sorted_views = {content_type: _merge_sorted(*lists) for content_type, lists in sorted_per_type.items()}
+    sorted_views['all'] = _merge_sorted(sorted_views['movies'], sorted_views['series'], sorted_views['anime'])
+
+    print(f"Catálogo construido: {len(cards['movies'])} películas, {len(cards['series'])} series, {len(cards['anime'])} animes.")
+    return MappingProxyType({
+        'version': version,
+        'movies': tuple(cards['movies']),
+        'series': tuple(cards['series']),
+        'anime': tuple(cards['anime']),
+        'movies_by_id': MappingProxyType(movies_by_id),
+        'shows_by_id': MappingProxyType(shows_by_id),
+        'content_by_id': MappingProxyType(content_by_id),
+        'sorted': MappingProxyType(sorted_views),
+        'search': search.SearchIndex(sorted_views['all']),
+        'facets': facets.FacetIndex(sorted_views['all']),
+    })
+
+# --- FICHAS EN FRAGMENTOS (MODO FRAGMENTADO, CARGA BAJO DEMANDA) ---
+
+# url del fragmento -> {'items': {id: ficha}, 'etag', 'digest', 'expires_at'}, en orden LRU.
+_shard_cache = OrderedDict()
+_shard_cache_lock = threading.Lock()
+_shard_fetch_locks = {}
+
+def _get_shard_cache_size():
+    return getattr(settings, 'CATALOG_SHARD_CACHE_SIZE', 32)
+
+def _ensure_manifest():
+    """
+    Devuelve el manifiesto sin cargar los listados: a una ficha le basta con él y con
+    su fragmento. Si está caducado se sigue usando mientras se revalida en segundo
+    plano; solo un arranque en frío espera (primero al snapshot en disco, luego a GitHub).
+    """
+    entry = _raw_cache.get(MANIFEST_KEY)
+    if entry is not None and entry['body'] is not None:
+        if _is_expired(entry):
+            if _get_refresh_mode() == 'background':
+                _start_background_refresh()
+            else:
+                with _refresh_lock:
+                    if _is_expired(_raw_cache.get(MANIFEST_KEY)):
+                        _refresh_raw(MANIFEST_KEY)
+        return _get_manifest()
+
+    with _refresh_lock:
+        if _catalog is None:
+            _load_persisted_catalog()
+        if _raw_cache.get(MANIFEST_KEY) is None:
+            _refresh_raw(MANIFEST_KEY)
+    return _get_manifest()
+
+def _locate_shard(ranges, content_id):
+    """(url, digest) del fragmento cuyo rango [min_id, max_id] contiene el id, o None."""
+    if not isinstance(content_id, int):
+        return None
+    position = bisect.bisect_right(ranges, content_id, key=lambda shard: shard[0]) - 1
+    if position >= 0 and ranges[position][0] <= content_id <= ranges[position][1]:
+        return ranges[position][2], ranges[position][3]
+    return None
+
+def _fetch_shard(url, previous, digest=None):
+    """
+    Descarga (o revalida con ETag) un fragmento y devuelve su nueva entrada de caché.
+    Si el manifiesto anuncia otro digest que el de la copia en caché no se revalida: se descarga.
+    """
+    revalidate = previous and previous['etag'] and (digest is None or previous['digest'] == digest)
+    headers = {'If-None-Match': previous['etag']} if revalidate else {}
+    print(f"Fetching shard: {url}")
     try:
-        response = requests.get(url, timeout=10)
+        response = _get_http_session().get(url, timeout=getattr(settings, 'GITHUB_RAW_TIMEOUT', 10), headers=headers)
+        if response.status_code == 304 and revalidate:
+            return dict(previous, expires_at=time.monotonic() + _get_cache_ttl())
         response.raise_for_status()
-        print(f"Successfully fetched data from {raw_key}.")
-        data = response.json()
-        if 'movies' not in data: data['movies'] = []
-        if 'series' not in data: data['series'] = []
-        if 'anime' not in data: data['anime'] = []
-        return data
+        data = _parse_raw_body(response.content)
     except (requests.RequestException, json.JSONDecodeError) as e:
-        print(f"FATAL: Could not fetch or parse data from {url}. Error: {e}")
-        return {"movies": [], "series": [], "anime": []}
+        print(f"FATAL: Could not fetch or parse shard {url}. Error: {e}")
+        items = previous['items'] if previous else {}
+        return {
+            'items': items, 'etag': previous['etag'] if previous else None, 'digest': previous['digest'] if previous else None,
+            'expires_at': time.monotonic() + _get_negative_ttl(),
+        }
+
+    body_digest = hashlib.sha1(response.content).hexdigest()[:12]
+    ttl = _get_cache_ttl()
+    if digest is not None and body_digest != digest:
+        # El fragmento publicado aún no es el que anuncia el manifiesto (p. ej. una CDN con la copia vieja).
+        # Se guarda con el digest anunciado y TTL corto para reintentar sin descargarlo en cada petición.
+        print(f"ADVERTENCIA: El fragmento {url} no coincide con el digest del manifiesto; se reintentará.")
+        body_digest, ttl = digest, _get_negative_ttl()
+    items = {}
+    for content_type in ('movies', 'series', 'anime'):
+        for item in data[content_type]:
+            if item.get('id') is not None and item['id'] not in items:
+                items[item['id']] = _encode_detail(item)
+    return {'items': items, 'etag': response.headers.get('ETag'), 'digest': body_digest, 'expires_at': time.monotonic() + ttl}
+
+def _is_current_shard(entry, digest):
+    """La copia en caché sirve si no ha caducado y es la que anuncia el manifiesto."""
+    return entry is not None and not _is_expired(entry) and (digest is None or entry['digest'] == digest)
+
+def _load_shard(url, digest=None):
+    """
+    {id: ficha} de un fragmento, con caché LRU acotada y TTL. Un solo fetch por fragmento a la vez.
+    Con el digest del manifiesto, una copia con otro contenido se vuelve a descargar aunque no haya caducado.
+    """
+    with _shard_cache_lock:
+        entry = _shard_cache.get(url)
+        if _is_current_shard(entry, digest):
+            _shard_cache.move_to_end(url)
+            return entry['items']
+        fetch_lock = _shard_fetch_locks.setdefault(url, threading.Lock())
+
+    with fetch_lock:
+        with _shard_cache_lock:
+            entry = _shard_cache.get(url)
+        if not _is_current_shard(entry, digest):
+            entry = _fetch_shard(url, entry, digest)
+        with _shard_cache_lock:
+            _shard_cache[url] = entry
+            _shard_cache.move_to_end(url)
+            while len(_shard_cache) > _get_shard_cache_size():
+                evicted_url, _ = _shard_cache.popitem(last=False)
+                _shard_fetch_locks.pop(evicted_url, None)
+        return entry['items']
+
+def _find_in_shards(content_types, content_id):
+    """Busca la ficha en el fragmento que corresponde al id, probando los tipos en orden."""
+    shard_index = _ensure_manifest().get('shard_index', {})
+    for content_type in content_types:
+        shard = _locate_shard(shard_index.get(content_type, ()), content_id)
+        if shard:
+            blob = _load_shard(*shard).get(content_id)
+            if blob is not None:
+                return blob
+    return None
+
+# --- SNAPSHOT PERSISTIDO EN DISCO (ARRANQUES EN CALIENTE Y CAÍDAS DE GITHUB) ---
+
+# Se incrementa cuando cambia la estructura del catálogo: los snapshots viejos se ignoran.
+SNAPSHOT_FORMAT = 10
+SNAPSHOT_FILENAME = 'catalog.pickle'
+
+def _get_snapshot_dir():
+    """Carpeta escribible donde se guarda el snapshot tras cada construcción."""
+    return Path(getattr(settings, 'CATALOG_SNAPSHOT_DIR', Path(tempfile.gettempdir()) / 'domoflix_catalog'))
+
+def _is_private(path):
+    """
+    True si el fichero o carpeta es del usuario del proceso y nadie más puede escribir
+    en él. pickle.load ejecuta código, así que en una carpeta compartida como /tmp otro
+    usuario podría dejar un snapshot preparado.
+    """
+    if not hasattr(os, 'getuid'):
+        return True
+    try:
+        st = os.stat(path)
+    except OSError:
+        return False
+    return st.st_uid == os.getuid() and not st.st_mode & (stat.S_IWGRP | stat.S_IWOTH)
+
+def _ensure_private_snapshot_dir():
+    """Crea la carpeta del snapshot solo para el usuario del proceso (0o700) y comprueba que lo sea."""
+    directory = _get_snapshot_dir()
+    directory.mkdir(mode=0o700, parents=True, exist_ok=True)
+    if not _is_private(directory):
+        raise PermissionError(f"La carpeta {directory} no es privada del usuario del proceso")
+    return directory
+
+def _get_bundled_snapshot_path():
+    """Snapshot generado en el build (manage.py build_catalog_snapshot) que viaja con el despliegue."""
+    path = getattr(settings, 'CATALOG_SNAPSHOT_BUNDLE_PATH', None)
+    return Path(path) if path else None
+
+def _thaw(catalog):
+    """Convierte el snapshot (mappings de solo lectura) en dicts para poder serializarlo."""
+    return {key: dict(value) if isinstance(value, MappingProxyType) else value for key, value in catalog.items()}
+
+def _freeze(catalog_dict):
+    """Operación inversa a _thaw."""
+    return MappingProxyType({key: MappingProxyType(value) if isinstance(value, dict) else value for key, value in catalog_dict.items()})
+
+def _get_snapshot_source():
+    """Configuración de origen con la que se generó un snapshot (para descartar los ajenos)."""
+    return _get_manifest_url() or dict(settings.GITHUB_RAW_URLS)
+
+def write_catalog_snapshot(catalog, path=None):
+    """
+    Guarda en disco (pickle) el catálogo construido junto con los raws, sus ETags y
+    digests, para poder revalidar con 304 tras un reinicio. La escritura es atómica.
+    Devuelve la ruta escrita.
+    """
+    path = Path(path) if path else _ensure_private_snapshot_dir() / SNAPSHOT_FILENAME
+    raw_keys = ([MANIFEST_KEY] if _get_manifest_url() else []) + list(_get_source_urls())
+    raws = {
+        raw_key: {'body': _raw_cache[raw_key]['body'], 'etag': _raw_cache[raw_key]['etag'], 'digest': _raw_cache[raw_key]['digest']}
+        for raw_key in raw_keys if raw_key in _raw_cache
+    }
+    payload = {'format': SNAPSHOT_FORMAT, 'built_at': time.time(), 'source': _get_snapshot_source(), 'raws': raws, 'catalog': _thaw(catalog)}
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix='.catalog-', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump(payload, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return path
+
+def _write_snapshot_quietly(catalog):
+    try:
+        path = write_catalog_snapshot(catalog)
+        print(f"Snapshot del catálogo guardado en {path}.")
+    except OSError as e:
+        print(f"ADVERTENCIA: No se pudo guardar el snapshot del catálogo. Error: {e}")
+
+def _read_snapshot(path, require_private=False):
+    """
+    Lee un snapshot y lo devuelve si es compatible con el formato y los raws configurados.
+    Con require_private solo se lee si él y su carpeta son privados del usuario del proceso.
+    """
+    if require_private and path.exists() and not (_is_private(path.parent) and _is_private(path)):
+        print(f"ADVERTENCIA: Snapshot del catálogo en {path} con propietario o permisos inseguros, se ignora.")
+        return None
+    try:
+        with open(path, 'rb') as f:
+            payload = pickle.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError) as e:
+        print(f"ADVERTENCIA: Snapshot del catálogo ilegible en {path}. Error: {e}")
+        return None
+
+    if not isinstance(payload, dict) or payload.get('format') != SNAPSHOT_FORMAT:
+        print(f"ADVERTENCIA: Snapshot del catálogo en {path} con formato incompatible, se ignora.")
+        return None
+    if payload.get('source') != _get_snapshot_source():
+        print(f"ADVERTENCIA: Snapshot del catálogo en {path} generado con otros GITHUB_RAW_URLS o manifiesto, se ignora.")
+        return None
+    return payload
+
+def _load_persisted_catalog():
+    """
+    Instala el snapshot más reciente (el de la carpeta de caché o el incluido en el
+    despliegue) como catálogo actual. Sus raws quedan caducados para que se
+    revaliden contra GitHub en segundo plano. Devuelve el catálogo o None.
+    """
+    global _catalog
+    # El de la carpeta de caché puede estar en /tmp; el incluido viaja con el código desplegado.
+    candidates = [(_get_snapshot_dir() / SNAPSHOT_FILENAME, True), (_get_bundled_snapshot_path(), False)]
+    payloads = [(path, _read_snapshot(path, require_private)) for path, require_private in candidates if path]
+    payloads = [(path, payload) for path, payload in payloads if payload]
+    if not payloads:
+        return None
+
+    path, payload = max(payloads, key=lambda candidate: candidate[1]['built_at'])
+    for raw_key, raw in payload['raws'].items():
+        _raw_cache[raw_key] = {'body': raw['body'], 'etag': raw['etag'], 'digest': raw['digest'], 'expires_at': 0, 'error': None}
+    _catalog = _freeze(payload['catalog'])
+    print(f"Catálogo {_catalog['version']} cargado desde el snapshot {path}.")
+    return _catalog
+
+# --- SNAPSHOT ACTUAL Y RECARGA (SÍNCRONA O EN SEGUNDO PLANO) ---
+
+# Snapshot publicado. Solo se reemplaza con una asignación, nunca se modifica.
+_catalog = None
+_refresh_thread = None
+_refresh_thread_lock = threading.Lock()
+
+def _get_refresh_mode():
+    """'background' (stale-while-revalidate) o 'sync' (la petición espera a la recarga)."""
+    return getattr(settings, 'CATALOG_REFRESH_MODE', 'background')
+
+def _rebuild_catalog():
+    """
+    Revalida los raws caducados y, si cambió la versión, construye el snapshot nuevo
+    por completo antes de publicarlo con una única asignación.
+    """
+    global _catalog
+    with _refresh_lock:
+        fresh_datas = _revalidate_raws()
+        version = compute_catalog_version()
+        if _catalog is None or _catalog['version'] != version:
+            # Solo se parsean los raws cuando de verdad hay que reconstruir.
+            _catalog = build_catalog(_collect_raw_datas(fresh_datas), version, with_details=not _get_manifest_url())
+            # Solo se persiste un catálogo completo: si algún raw no tiene datos se conserva el snapshot anterior.
+            if all(_raw_cache[raw_key]['body'] is not None for raw_key in _get_source_urls()):
+                threading.Thread(target=_write_snapshot_quietly, args=(_catalog,), name='catalog-snapshot', daemon=True).start()
+        return _catalog
+
+def _background_refresh():
+    try:
+        _rebuild_catalog()
+    except Exception as e:
+        print(f"FATAL: Falló la recarga del catálogo en segundo plano. Error: {type(e).__name__}: {e}")
+
+def _start_background_refresh():
+    """Lanza el worker de recarga si no hay ya uno en marcha (un solo worker a la vez)."""
+    global _refresh_thread
+    with _refresh_thread_lock:
+        if _refresh_thread is not None and _refresh_thread.is_alive():
+            return
+        _refresh_thread = threading.Thread(target=_background_refresh, name='catalog-refresh', daemon=True)
+        _refresh_thread.start()
+
+def get_catalog():
+    """
+    Devuelve el snapshot actual del catálogo. Cuando algún raw caduca se revalida
+    (una petición condicional por raw) y el catálogo solo se reconstruye si cambió
+    su versión. En modo 'background' se sigue sirviendo el snapshot actual mientras
+    un worker prepara el siguiente. Al arrancar se usa el snapshot guardado en disco
+    si existe; solo un arranque sin snapshot espera a la descarga.
+    """
+    catalog = _catalog
+    if catalog is not None and not _raws_expired():
+        return catalog
+
+    if catalog is None:
+        # Arranque: primero el snapshot en disco; GitHub se revalida en segundo plano.
+        with _refresh_lock:
+            catalog = _catalog or _load_persisted_catalog()
+        if catalog is not None:
+            _start_background_refresh()
+            return catalog
+
+    if catalog is not None and _get_refresh_mode() == 'background':
+        _start_background_refresh()
+        return catalog
+
+    with _refresh_lock:
+        if _catalog is None or _raws_expired():
+            return _rebuild_catalog()
+        return _catalog
+
+def get_catalog_version():
+    """Versión (hash corto) del catálogo en uso."""
+    return get_catalog()['version']
+
+def get_detail_version():
+    """
+    Versión de la que dependen las fichas. Con los raws completos es la del catálogo; en
+    modo fragmentado es el digest del manifiesto (que incluye el de cada fragmento), así
+    que una ficha no obliga a cargar los listados.
+    """
+    if not _get_manifest_url():
+        return get_catalog_version()
+    _ensure_manifest()
+    entry = _raw_cache.get(MANIFEST_KEY)
+    return f"manifest-{entry['digest'] if entry else None}"
 
 # --- FUNCIONES DE LÓGICA QUE USAN LOS DATOS CACHADOS ---
 
+# Los listados devuelven tarjetas (Card); la ficha completa se obtiene con find_*_by_id.
+
 def get_all_movies():
-    """Obtiene y combina TODAS las películas de los 3 archivos."""
-    all_movies = []
-    for raw_key in settings.GITHUB_RAW_URLS.keys():
-        data = get_data_from_raw(raw_key)
-        all_movies.extend(data.get('movies', []))
-    return all_movies
+    """Obtiene TODAS las películas de los 3 archivos."""
+    return get_catalog()['movies']
 
 def get_all_series():
-    """Obtiene y combina TODAS las series de los 3 archivos."""
-    all_series = []
-    for raw_key in settings.GITHUB_RAW_URLS.keys():
-        data = get_data_from_raw(raw_key)
-        all_series.extend(data.get('series', []))
-    return all_series
+    """Obtiene TODAS las series de los 3 archivos."""
+    return get_catalog()['series']
 
 def get_all_animes():
-    """Obtiene y combina TODOS los animes de los 3 archivos."""
-    all_animes = []
-    for raw_key in settings.GITHUB_RAW_URLS.keys():
-        data = get_data_from_raw(raw_key)
-        all_animes.extend(data.get('anime', []))
-    return all_animes
+    """Obtiene TODOS los animes de los 3 archivos."""
+    return get_catalog()['anime']
 
 def get_all_content():
     """Devuelve todo el contenido, combinando películas, series y animes."""
@@ -63,43 +853,174 @@ def get_all_content():
     # La ordenación se mueve a get_paginated_content para manejar los None correctamente
     return all_content
 
+# Tipos que cubre cada índice de fichas, en orden de preferencia.
+_INDEX_CONTENT_TYPES = {
+    'movies_by_id': ('movies',),
+    'shows_by_id': ('series', 'anime'),
+    'content_by_id': ('movies', 'series', 'anime'),
+}
+
+def _find_detail(index_name, content_id):
+    if _get_manifest_url():
+        # Modo fragmentado: solo hace falta el manifiesto y un fragmento, no los listados.
+        blob = _find_in_shards(_INDEX_CONTENT_TYPES[index_name], content_id)
+    else:
+        blob = get_catalog()[index_name].get(content_id)
+    return _decode_detail(blob) if blob is not None else None
+
 def find_movie_by_id(movie_id):
-    """Encuentra una película por su ID."""
-    for movie in get_all_movies():
-        if movie.get('id') == movie_id:
-            return movie
-    return None
+    """Encuentra una película por su ID y devuelve su ficha completa."""
+    return _find_detail('movies_by_id', movie_id)
 
 def find_series_by_id(content_id):
-    """Encuentra una serie O ANIME por su ID."""
-    all_series_and_animes = get_all_series() + get_all_animes()
-    for item in all_series_and_animes:
-        if item.get('id') == content_id:
-            return item
-    return None
+    """Encuentra una serie O ANIME por su ID y devuelve su ficha completa."""
+    return _find_detail('shows_by_id', content_id)
+
+def find_content_by_id(content_id):
+    """Encuentra cualquier contenido (película, serie o anime) por su ID y devuelve su ficha completa."""
+    return _find_detail('content_by_id', content_id)
+
+def iter_episode_paths():
+    """
+    Rutas de todos los episodios (para el sitemap), en el orden de las series en el
+    catálogo. Decodifica las fichas sin pasar por la caché LRU para no desalojar las
+    de las páginas visitadas. En modo fragmentado no hay fichas en memoria y no devuelve nada.
+    """
+    for blob in get_catalog()['shows_by_id'].values():
+        item = pickle.loads(blob)
+        if item.get('episode_nav'):
+            url_template = _episode_url_template(item)
+            for season_number, episode_number in item['episode_nav']:
+                yield url_template.format(season=season_number, episode=episode_number)
+
+def _filter_mask(catalog, content_type, filters):
+    """Bitset (sobre la vista 'all') de las tarjetas del tipo pedido que cumplen los filtros."""
+    filters = dict(filters)
+    if content_type in ('movies', 'series', 'anime'):
+        filters['type'] = [content_type]
+    return catalog['facets'].match(filters)
+
+def get_paginated_content(content_type='all', page=1, per_page=30, filters=None):
+    """Devuelve tarjetas paginadas a partir de las vistas ya ordenadas (solo corta la lista)."""
+    catalog = get_catalog()
+    if filters:
+        all_view = catalog['sorted']['all']
+        positions, has_more = catalog['facets'].page(_filter_mask(catalog, content_type, filters), 0, per_page, skip=(page - 1) * per_page)
+        return tuple(all_view[position] for position in positions), has_more
+
+    sorted_views = catalog['sorted']
+    sorted_content = sorted_views.get(content_type, sorted_views['all'])
 
-def get_paginated_content(content_type='all', page=1, per_page=30):
-    """Devuelve contenido paginado. Lógica corregida para ordenar después de filtrar."""
-    
-    # 1. Selecciona la lista correcta ANTES de ordenar
-    if content_type == 'movies':
-        content_list = get_all_movies()
-    elif content_type == 'series':
-        content_list = get_all_series()
-    elif content_type == 'anime':
-        content_list = get_all_animes()
-    else: # 'all'
-        content_list = get_all_content()
-
-    # 2. Ordena la lista específica, manejando fechas que puedan ser None
-    # --- LÍNEA CORREGIDA ---
-    sorted_content = sorted(content_list, key=lambda x: x.get('release_date') or '1900-01-01', reverse=True)
-
-    # 3. La lógica de paginación no cambia
     start = (page - 1) * per_page
     end = start + per_page
-    
+
     paginated_items = sorted_content[start:end]
     has_more = len(sorted_content) > end
-    
-    return paginated_items, has_more
\ No newline at end of file
+
+    return paginated_items, has_more
+
+# --- PAGINACIÓN POR CURSOR ---
+
+def encode_cursor(card):
+    """Cursor opaco que apunta justo después de la tarjeta dada."""
+    return base64.urlsafe_b64encode(json.dumps(card.sort_key, separators=(',', ':')).encode()).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    """Devuelve la clave de ordenación guardada en el cursor. Lanza ValueError si no es válido."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        date, content_type, content_id = json.loads(raw)
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Cursor inválido: {cursor!r}") from e
+    if not isinstance(date, str) or not isinstance(content_type, str) or not isinstance(content_id, int):
+        raise ValueError(f"Cursor inválido: {cursor!r}")
+    return (date, content_type, content_id)
+
+def _position_after(sorted_view, key):
+    """
+    Primer índice de la vista (ordenada de mayor a menor) cuya clave es menor que key.
+    Es una búsqueda binaria: una página profunda cuesta lo mismo que la segunda.
+    """
+    lo, hi = 0, len(sorted_view)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if sorted_view[mid].sort_key < key:
+            hi = mid
+        else:
+            lo = mid + 1
+    return lo
+
+def get_content_page(content_type='all', cursor=None, limit=40, filters=None):
+    """
+    Devuelve (tarjetas, next_cursor). El cursor guarda la clave de la última tarjeta
+    servida, no una posición, así que una recarga del catálogo a mitad del scroll no
+    duplica ni salta tarjetas. next_cursor es None cuando no hay más contenido.
+    Con filtros ({faceta: [valores]}) se recorre la vista 'all' con el bitset de facetas.
+    """
+    catalog = get_catalog()
+    sorted_views = catalog['sorted']
+    sorted_content = sorted_views['all'] if filters else sorted_views.get(content_type, sorted_views['all'])
+
+    start = _position_after(sorted_content, decode_cursor(cursor)) if cursor else 0
+    if filters:
+        positions, has_more = catalog['facets'].page(_filter_mask(catalog, content_type, filters), start, limit)
+        items = tuple(sorted_content[position] for position in positions)
+    else:
+        items = sorted_content[start:start + limit]
+        has_more = len(sorted_content) > start + limit
+    next_cursor = encode_cursor(items[-1]) if has_more and items else None
+    return items, next_cursor
+
+def search_content(query, page=1, per_page=40):
+    """
+    Búsqueda paginada sobre el índice de la versión actual del catálogo. Devuelve
+    (tarjetas, has_more); el total de resultados se limita a SEARCH_RESULTS_LIMIT.
+    """
+    limit = getattr(settings, 'SEARCH_RESULTS_LIMIT', 100)
+    min_similarity = getattr(settings, 'SEARCH_MIN_SIMILARITY', 0.45)
+    results = get_catalog()['search'].search(query, limit, min_similarity)
+    start = (page - 1) * per_page
+    return results[start:start + per_page], len(results) > start + per_page
+
+# --- SUGERENCIAS DE BÚSQUEDA (AUTOCOMPLETADO) ---
+
+# (prefijo normalizado, límite) -> JSON de las sugerencias, en orden LRU. Se vacía al cambiar de versión.
+_suggestion_cache = OrderedDict()
+_suggestion_cache_version = None
+_suggestion_cache_lock = threading.Lock()
+
+def suggest_content(query, limit=8):
+    """
+    Sugerencias para una búsqueda parcial como JSON ya serializado (lista de tarjetas).
+    Usa el índice de búsqueda del catálogo y cachea los prefijos recientes.
+    """
+    global _suggestion_cache_version
+    catalog = get_catalog()
+    normalized_query = ' '.join(search.normalize_text(query).split())
+    key = (normalized_query, limit)
+    with _suggestion_cache_lock:
+        if _suggestion_cache_version != catalog['version']:
+            _suggestion_cache.clear()
+            _suggestion_cache_version = catalog['version']
+        cached = _suggestion_cache.get(key)
+        if cached is not None:
+            _suggestion_cache.move_to_end(key)
+            return cached
+
+    min_similarity = getattr(settings, 'SEARCH_MIN_SIMILARITY', 0.45)
+    cards = catalog['search'].search(normalized_query, limit, min_similarity) if normalized_query else []
+    body = b'[' + b','.join(card.card_json for card in cards) + b']'
+    with _suggestion_cache_lock:
+        if _suggestion_cache_version == catalog['version']:
+            _suggestion_cache[key] = body
+            while len(_suggestion_cache) > getattr(settings, 'SEARCH_SUGGESTIONS_CACHE_SIZE', 512):
+                _suggestion_cache.popitem(last=False)
+    return body
+
+def get_facet_counts(content_type='all', filters=None):
+    """Recuentos {faceta: {valor: n}} para el tipo pedido con los filtros aplicados."""
+    catalog = get_catalog()
+    filters = dict(filters or {})
+    if content_type in ('movies', 'series', 'anime'):
+        filters['type'] = [content_type]
+    return catalog['facets'].counts(filters)
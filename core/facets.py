@@ -0,0 +1,88 @@
+# Archivo: core/facets.py
+
+# Facetas por las que se puede filtrar el catálogo.
+FACETS = ('type', 'genre', 'year', 'language')
+# Parámetro GET de cada faceta. El tipo va en ?kind= porque ?type= ya es el tipo de
+# catálogo que pide /cargar-mas/.
+FACET_PARAMS = {'type': 'kind', 'genre': 'genre', 'year': 'year', 'language': 'language'}
+
+# Tipo de la tarjeta -> clave de tipo que usan las vistas (igual que content_type).
+TYPE_KEYS = {'Película': 'movies', 'Serie': 'series', 'Anime': 'anime'}
+
+def card_facet_values(card):
+    """Valores de cada faceta para una tarjeta."""
+    return {
+        'type': (TYPE_KEYS.get(card.type, 'series'),),
+        'genre': card.genres,
+        'year': (card.release_date[:4],) if card.release_date else (),
+        'language': card.languages,
+    }
+
+def _to_bitset(positions, size):
+    """Entero con un bit a 1 por posición (se arma en un bytearray para no crear un entero por bit)."""
+    buffer = bytearray((size + 7) // 8)
+    for position in positions:
+        buffer[position >> 3] |= 1 << (position & 7)
+    return int.from_bytes(buffer, 'little')
+
+class FacetIndex:
+    """
+    Un bitset (entero de Python) por valor de faceta sobre las posiciones de la vista
+    'all'. Filtrar es hacer OR entre los valores de una faceta y AND entre facetas;
+    los recuentos salen de los mismos bitsets con bit_count().
+    """
+
+    def __init__(self, cards):
+        self.size = len(cards)
+        self.all_bits = (1 << self.size) - 1
+        positions = {facet: {} for facet in FACETS}
+        for position, card in enumerate(cards):
+            for facet, values in card_facet_values(card).items():
+                for value in values:
+                    positions[facet].setdefault(value, []).append(position)
+        self.bitsets = {
+            facet: {value: _to_bitset(value_positions, self.size) for value, value_positions in values.items()}
+            for facet, values in positions.items()
+        }
+
+    def match(self, filters):
+        """Bitset de las posiciones que cumplen {faceta: [valores]}."""
+        mask = self.all_bits
+        for facet, values in filters.items():
+            facet_bitsets = self.bitsets.get(facet)
+            if facet_bitsets is None or not values:
+                continue
+            union = 0
+            for value in values:
+                union |= facet_bitsets.get(value, 0)
+            mask &= union
+        return mask
+
+    def counts(self, filters):
+        """
+        {faceta: {valor: recuento}}. Cada faceta se cuenta con los filtros de las demás,
+        para que al elegir un género sigan apareciendo los otros con su recuento.
+        """
+        result = {}
+        for facet in FACETS:
+            mask = self.match({other: values for other, values in filters.items() if other != facet})
+            facet_counts = {value: (bits & mask).bit_count() for value, bits in self.bitsets[facet].items()}
+            result[facet] = {value: count for value, count in facet_counts.items() if count}
+        return result
+
+    @staticmethod
+    def page(mask, start, limit, skip=0):
+        """
+        Hasta 'limit' posiciones del bitset a partir de 'start', saltando antes 'skip'
+        coincidencias. Devuelve (posiciones, has_more).
+        """
+        mask >>= start
+        positions = []
+        while mask and len(positions) < limit:
+            lowest = mask & -mask
+            mask ^= lowest
+            if skip:
+                skip -= 1
+                continue
+            positions.append(start + lowest.bit_length() - 1)
+        return positions, bool(mask)
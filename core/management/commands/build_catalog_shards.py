@@ -0,0 +1,77 @@
+# Archivo: core/management/commands/build_catalog_shards.py
+
+import json
+import hashlib
+from pathlib import Path
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core import data_manager
+
+CONTENT_TYPES = ('movies', 'series', 'anime')
+
+class Command(BaseCommand):
+    help = 'Descarga los raws de GitHub y genera el catálogo fragmentado: manifiesto, listados y fragmentos de fichas por rango de id.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', type=str, required=True, help='Directorio donde escribir manifest.json, los listados y los fragmentos.')
+        parser.add_argument('--shard-size', type=int, default=500, help='Fichas por fragmento (por defecto 500).')
+
+    def _write_json(self, path, data):
+        """Escribe el JSON compacto y devuelve el digest de su contenido."""
+        body = json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        with open(path, 'wb') as f:
+            f.write(body)
+        return hashlib.sha1(body).hexdigest()[:12]
+
+    def handle(self, *args, **kwargs):
+        if kwargs['shard_size'] < 1:
+            raise CommandError("--shard-size debe ser mayor que 0.")
+        output = Path(kwargs['output'])
+        output.mkdir(parents=True, exist_ok=True)
+
+        # --- 1. DESCARGAR LOS RAWS ORIGINALES (en su orden, como el modo clásico) ---
+        self.stdout.write(self.style.NOTICE("--- Descargando raws de GitHub ---"))
+        session = data_manager._get_http_session()
+        items_by_type = {content_type: [] for content_type in CONTENT_TYPES}
+        seen_ids = {content_type: set() for content_type in CONTENT_TYPES}
+        for raw_key, url in getattr(settings, 'GITHUB_RAW_URLS', {}).items():
+            try:
+                response = session.get(url, timeout=getattr(settings, 'GITHUB_RAW_TIMEOUT', 10))
+                response.raise_for_status()
+                data = data_manager._parse_raw_body(response.content)
+            except Exception as e:
+                raise CommandError(f"No se pudo descargar '{raw_key}' ({url}): {e}")
+            for content_type in CONTENT_TYPES:
+                for item in data[content_type]:
+                    if not isinstance(item.get('id'), int):
+                        self.stdout.write(self.style.WARNING(f"ADVERTENCIA: Se omite un elemento de '{raw_key}' sin id numérico: {item.get('title')}"))
+                        continue
+                    if item['id'] in seen_ids[content_type]:
+                        continue
+                    seen_ids[content_type].add(item['id'])
+                    items_by_type[content_type].append(item)
+
+        # --- 2. LISTADOS (solo los campos de las tarjetas, con los idiomas ya calculados) ---
+        listing_files = []
+        for content_type in CONTENT_TYPES:
+            filename = f"listing-{content_type}.json"
+            listing = [data_manager.Card(item).as_dict() for item in items_by_type[content_type]]
+            self._write_json(output / filename, {content_type: listing})
+            listing_files.append(filename)
+
+        # --- 3. FRAGMENTOS DE FICHAS POR RANGO DE ID ---
+        shards = []
+        for content_type in CONTENT_TYPES:
+            items = sorted(items_by_type[content_type], key=lambda item: item['id'])
+            for start in range(0, len(items), kwargs['shard_size']):
+                chunk = items[start:start + kwargs['shard_size']]
+                filename = f"{content_type}-{len(shards):04d}.json"
+                digest = self._write_json(output / filename, {content_type: chunk})
+                # Con el digest de cada fragmento en el manifiesto, cualquier cambio en una ficha cambia el manifiesto.
+                shards.append({'url': filename, 'type': content_type, 'min_id': chunk[0]['id'], 'max_id': chunk[-1]['id'], 'digest': digest})
+
+        # El manifiesto se escribe el último para no publicar uno que apunte a ficheros a medio escribir.
+        self._write_json(output / 'manifest.json', {'format': 1, 'listing': listing_files, 'shards': shards})
+        total = sum(len(items) for items in items_by_type.values())
+        self.stdout.write(self.style.SUCCESS(f"Catálogo fragmentado en '{output}': {total} fichas en {len(shards)} fragmentos."))
@@ -0,0 +1,31 @@
+# Archivo: core/management/commands/build_catalog_snapshot.py
+
+from pathlib import Path
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core import data_manager
+
+class Command(BaseCommand):
+    help = 'Descarga los raws de GitHub y genera el snapshot compilado del catálogo para incluirlo en el despliegue.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', type=str, default=None, help='Ruta del snapshot. Por defecto CATALOG_SNAPSHOT_BUNDLE_PATH.')
+        parser.add_argument('--allow-partial', action='store_true', help='Genera el snapshot aunque algún raw haya fallado.')
+
+    def handle(self, *args, **kwargs):
+        output = kwargs['output'] or getattr(settings, 'CATALOG_SNAPSHOT_BUNDLE_PATH', None)
+        if not output:
+            raise CommandError("Indica --output o define CATALOG_SNAPSHOT_BUNDLE_PATH en settings.py.")
+
+        self.stdout.write(self.style.NOTICE("--- Descargando raws de GitHub ---"))
+        raw_datas = data_manager.load_all_raws()
+        report = data_manager.get_load_report()
+        failed = [raw_key for raw_key, info in report.items() if info['status'] == 'fallo']
+        if failed and not kwargs['allow_partial']:
+            raise CommandError(f"Fallaron los raws {', '.join(failed)}. Usa --allow-partial para generar el snapshot igualmente.")
+
+        catalog = data_manager.build_catalog(raw_datas, data_manager.compute_catalog_version())
+        path = data_manager.write_catalog_snapshot(catalog, Path(output))
+        size_mb = path.stat().st_size / (1024 * 1024)
+        self.stdout.write(self.style.SUCCESS(f"Snapshot {catalog['version']} guardado en '{path}' ({size_mb:.1f} MB)."))
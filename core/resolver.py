@@ -1,7 +1,16 @@
 # Archivo: core/resolver.py (VERSIÓN FINAL CON CLOUDSCRAPER)
 
 import re
+import time
+import codecs
+import threading
+import requests
 import cloudscraper
+from cloudscraper.exceptions import CloudflareException
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from urllib.parse import urlparse, parse_qs
+from django.conf import settings
 
 # Creamos una única instancia de scraper para reutilizarla.
 # Esto mejora el rendimiento y la gestión de cookies/sesiones.
@@ -14,12 +23,128 @@ scraper = cloudscraper.create_scraper(
     }
 )
 
-def resolve_with_cloudscraper(iframe_url: str) -> str | None:
+# --- EXTRACCIÓN DEL M3U8 (LECTURA EN STREAMING) ---
+
+# Cualquier URL que termine en .m3u8, con sus posibles parámetros (tokens, caducidad...).
+M3U8_URL_PATTERN = re.compile(r'(https?://[^\s"\'<>]+\.m3u8[^\s"\'<>]*)')
+# La fuente declarada en la configuración del reproductor (jwplayer: file:"...", voe: 'hls': '...').
+PLAYER_SOURCE_PATTERN = re.compile(r'''["']?(?:file|hls|src)["']?\s*:\s*["'](https?://[^"']+?\.m3u8[^"']*)["']''')
+# Reproductores empaquetados con el packer de Dean Edwards: eval(function(p,a,c,k,e,d){...}('...',base,n,'...'.split('|')...
+PACKED_JS_MARKER = 'eval(function(p,a,c,k,e,d)'
+PACKED_JS_PATTERN = re.compile(r"\}\('((?:[^'\\]|\\.)*)',\s*(\d+),\s*(\d+),\s*'([^']*)'\.split\('\|'\)", re.S)
+PACKED_JS_DIGITS = '0123456789abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ'
+
+# Host -> patrones a probar, en orden. Los que no estén aquí usan solo la búsqueda genérica.
+HOST_PATTERNS = {
+    'streamwish.to': (PLAYER_SOURCE_PATTERN, M3U8_URL_PATTERN),
+    'filemoon.sx': (PLAYER_SOURCE_PATTERN, M3U8_URL_PATTERN),
+    'filelions.to': (PLAYER_SOURCE_PATTERN, M3U8_URL_PATTERN),
+    'voe.sx': (PLAYER_SOURCE_PATTERN, M3U8_URL_PATTERN),
+}
+DEFAULT_PATTERNS = (M3U8_URL_PATTERN,)
+
+# Lo que se vuelve a mirar del final del texto ya leído, por si una URL quedó partida entre bloques.
+SCAN_OVERLAP = 4096
+SCAN_CHUNK_SIZE = 16 * 1024
+
+def unpack_packed_js(payload, base, count, keywords):
+    """Deshace el packer (p,a,c,k,e,d): cada palabra es un índice en base 'base' dentro de 'keywords'."""
+    def to_index(word):
+        index = 0
+        for char in word:
+            digit = PACKED_JS_DIGITS.find(char)
+            if digit < 0 or digit >= base:
+                return None
+            index = index * base + digit
+        return index
+
+    def replace(match):
+        index = to_index(match.group(0))
+        if index is None or index >= count or index >= len(keywords) or not keywords[index]:
+            return match.group(0)
+        return keywords[index]
+
+    return re.sub(r'\b\w+\b', replace, payload.replace("\\'", "'"))
+
+def _find_m3u8(text, start, patterns, complete):
+    """
+    (url, None) si algún patrón encuentra el m3u8 a partir de 'start'; si no, (None, desde dónde
+    volver a buscar). Un acierto que toca el final del texto puede estar cortado, así que solo
+    vale con el texto completo.
+    """
+    retry_from = max(start, len(text) - SCAN_OVERLAP)
+    for pattern in patterns:
+        match = pattern.search(text, start)
+        if match is None:
+            continue
+        if complete or match.end() < len(text):
+            return match.group(1).replace('\\', ''), None  # Limpiamos barras invertidas
+        retry_from = min(retry_from, match.start())
+    return None, retry_from
+
+def scan_for_m3u8(chunks, patterns=DEFAULT_PATTERNS):
+    """
+    Busca el m3u8 en el cuerpo a medida que llega ('chunks' de texto), incluido el código de
+    los reproductores empaquetados, y deja de leer en cuanto lo encuentra.
+    """
+    text = ''
+    scan_from = packed_from = 0
+    for chunk in chunks:
+        text += chunk
+        m3u8_url, scan_from = _find_m3u8(text, scan_from, patterns, complete=False)
+        if m3u8_url:
+            return m3u8_url
+        m3u8_url, packed_from = _scan_packed(text, packed_from, patterns)
+        if m3u8_url:
+            return m3u8_url
+    # Fin del cuerpo: lo que quedaba pendiente en el borde ya no puede crecer.
+    m3u8_url, _ = _find_m3u8(text, scan_from, patterns, complete=True)
+    return m3u8_url
+
+def _scan_packed(text, start, patterns):
+    """(url o None, desde dónde seguir buscando bloques empaquetados)."""
+    while True:
+        marker = text.find(PACKED_JS_MARKER, start)
+        if marker < 0:
+            return None, max(start, len(text) - len(PACKED_JS_MARKER))
+        packed = PACKED_JS_PATTERN.search(text, marker)
+        if packed is None:
+            # El bloque aún no ha llegado entero.
+            return None, marker
+        payload, base, count, keywords = packed.groups()
+        unpacked = unpack_packed_js(payload, int(base), int(count), keywords.split('|'))
+        m3u8_url, _ = _find_m3u8(unpacked, 0, patterns, complete=True)
+        if m3u8_url:
+            return m3u8_url, None
+        start = packed.end()
+
+def _iter_text(response, max_bytes, deadline):
+    """Decodifica el cuerpo por bloques hasta RESOLVER_SCAN_MAX_BYTES o hasta agotar el tiempo."""
+    decoder = codecs.getincrementaldecoder(response.encoding or 'utf-8')(errors='replace')
+    read = 0
+    for chunk in response.iter_content(chunk_size=SCAN_CHUNK_SIZE):
+        read += len(chunk)
+        yield decoder.decode(chunk)
+        if read >= max_bytes:
+            print(f"--- [Cloudscraper] Se deja de leer tras {read // 1024} KB sin encontrar el m3u8.")
+            return
+        if time.monotonic() > deadline:
+            print("--- [Cloudscraper] Tiempo agotado leyendo la respuesta.")
+            return
+    yield decoder.decode(b'', final=True)
+
+def resolve_with_cloudscraper(iframe_url: str, timeout: float = 25) -> str | None:
     """
     Usa la librería Cloudscraper para obtener el contenido de una URL
     y extraer el enlace .m3u8, simulando ser un navegador real.
+    El cuerpo se lee en streaming y la descarga se corta en cuanto aparece el enlace.
     """
     print(f"--- [Cloudscraper] Resolviendo: {iframe_url}")
+    host = urlparse(iframe_url).netloc
+    if not _allow_request(host):
+        print(f"--- [Cloudscraper] Circuito abierto para {host}: se omite la petición.")
+        return None
+    started = time.monotonic()
     
     try:
         # Añadimos cabeceras realistas para minimizar la probabilidad de bloqueo.
@@ -29,43 +154,313 @@ def resolve_with_cloudscraper(iframe_url: str) -> str | None:
             'Referer': iframe_url
         }
         
-        # Hacemos la petición directa a la URL del iframe
-        response = scraper.get(iframe_url, timeout=25, headers=headers)
-        
-        print(f"--- [Cloudscraper] Respuesta recibida con estado: {response.status_code}")
-        response.raise_for_status() # Lanza un error para códigos 4xx/5xx
-        
-        # Usamos la misma expresión regular robusta para encontrar el M3U8
-        # Esta expresión busca cualquier URL que termine en .m3u8 con posibles parámetros
-        m3u8_match = re.search(r'(https?://[^\s"\'<>]+\.m3u8[^\s"\'<>]*?)', response.text)
+        # Hacemos la petición directa a la URL del iframe, sin descargar aún el cuerpo
+        with scraper.get(iframe_url, timeout=timeout, headers=headers, stream=True) as response:
+            print(f"--- [Cloudscraper] Respuesta recibida con estado: {response.status_code}")
+            response.raise_for_status() # Lanza un error para códigos 4xx/5xx
+            
+            chunks = _iter_text(response, getattr(settings, 'RESOLVER_SCAN_MAX_BYTES', 2 * 1024 * 1024), started + timeout)
+            m3u8_url = scan_for_m3u8(chunks, HOST_PATTERNS.get(host, DEFAULT_PATTERNS))
         
-        if m3u8_match:
-            m3u8_url = m3u8_match.group(1).replace('\\', '') # Limpiamos barras invertidas
+        if m3u8_url:
             print(f"--- [Cloudscraper] ¡ÉXITO! M3U8 encontrado: {m3u8_url[:100]}...")
+            _record_result(host, True, time.monotonic() - started)
             return m3u8_url
         else:
+            # La página respondió: es un vídeo sin enlace, no un host caído (de eso se ocupa la caché negativa).
             print("--- [Cloudscraper] FALLO: No se encontró la URL .m3u8 en la respuesta.")
-            # Para depurar en Vercel, puedes ir a los logs del despliegue y ver esta salida.
-            # print(f"--- HTML recibido ---\n{response.text[:2000]}\n--- Fin HTML ---")
+            _record_reachable(host)
             return None
             
     except Exception as e:
         print(f"--- [Cloudscraper] ERROR en la petición: {type(e).__name__}: {e}")
+        if _is_host_failure(e):
+            _record_result(host, False, time.monotonic() - started)
+        elif isinstance(e, requests.HTTPError):
+            # Un 404 es un vídeo borrado, pero el host respondió.
+            _record_reachable(host)
         return None
 
+# --- SALUD DE LOS HOSTS Y CIRCUIT BREAKER ---
+
+# Servidor (como aparece en las fuentes) -> host al que se conecta su resolver.
+SERVER_HOSTS = {'streamwish': 'streamwish.to', 'sw': 'streamwish.to', 'filemoon': 'filemoon.sx', 'vidhide': 'filelions.to', 'voesx': 'voe.sx'}
+
+# Peso de la última petición en las medias móviles de éxito y latencia.
+HEALTH_ALPHA = 0.2
+
+# host -> {'success_rate', 'latency', 'failures' (seguidos), 'open_until' (0 = circuito cerrado)}
+_host_health = {}
+_health_lock = threading.Lock()
+
+def _health_score(state):
+    """Entre 0 y 1: tasa de éxito penalizada por la latencia media."""
+    return state['success_rate'] / (1 + state['latency'] / getattr(settings, 'RESOLVER_HEALTH_LATENCY_SCALE', 5))
+
+def _health_rank(state):
+    """Lo que decide el orden: circuito abierto y puntuación redondeada (para no reordenar por ruido)."""
+    if state is None:
+        return (False, round(getattr(settings, 'RESOLVER_HEALTH_DEFAULT_SCORE', 0.6), 1))
+    return (state['open_until'] > 0, round(_health_score(state), 1))
+
+def _is_host_failure(error):
+    """
+    True si el error es del host y no de un vídeo concreto: conexión, timeout, 5xx o
+    bloqueo (403 / reto de Cloudflare). Un 404 de un vídeo borrado no cuenta.
+    """
+    if isinstance(error, (requests.ConnectionError, requests.Timeout, CloudflareException)):
+        return True
+    if isinstance(error, requests.HTTPError) and error.response is not None:
+        status = error.response.status_code
+        return status >= 500 or status == 403
+    return False
+
+def _allow_request(host):
+    """
+    False si el circuito del host está abierto. Pasado RESOLVER_BREAKER_COOLDOWN deja
+    pasar una sola petición de prueba; el resto sigue fallando rápido hasta que responda.
+    """
+    with _health_lock:
+        state = _host_health.get(host)
+        if state is None or not state['open_until']:
+            return True
+        if time.monotonic() < state['open_until']:
+            return False
+        state['open_until'] = time.monotonic() + getattr(settings, 'RESOLVER_BREAKER_COOLDOWN', 60)
+        return True
+
+def _record_result(host, success, latency):
+    with _health_lock:
+        state = _host_health.get(host)
+        if state is None:
+            state = _host_health[host] = {'success_rate': 1.0, 'latency': latency, 'failures': 0, 'open_until': 0}
+        state['success_rate'] += HEALTH_ALPHA * ((1.0 if success else 0.0) - state['success_rate'])
+        state['latency'] += HEALTH_ALPHA * (latency - state['latency'])
+        if success:
+            state['failures'] = 0
+            state['open_until'] = 0
+        else:
+            state['failures'] += 1
+            if state['failures'] >= getattr(settings, 'RESOLVER_BREAKER_THRESHOLD', 5):
+                if not state['open_until']:
+                    print(f"ADVERTENCIA: {host} ha fallado {state['failures']} veces seguidas; se abre su circuito.")
+                state['open_until'] = time.monotonic() + getattr(settings, 'RESOLVER_BREAKER_COOLDOWN', 60)
+
+def _record_reachable(host):
+    """
+    El host respondió aunque el vídeo no sirva (404, página sin m3u8): no es una muestra
+    de éxito, pero demuestra que está vivo, así que cierra su circuito (también tras la
+    petición de prueba del estado semiabierto) y reinicia los fallos seguidos.
+    """
+    with _health_lock:
+        state = _host_health.get(host)
+        if state is not None:
+            state['failures'] = 0
+            state['open_until'] = 0
+
+def health_sort_key(server_name):
+    """Clave para ordenar servidores por salud en vivo: primero circuito cerrado, luego mejor puntuación."""
+    host = SERVER_HOSTS.get((server_name or '').lower())
+    with _health_lock:
+        circuit_open, score = _health_rank(_host_health.get(host) if host else None)
+    return (circuit_open, -score)
+
 # --- LAS FUNCIONES DE ENTRADA NO CAMBIAN SU NOMBRE, SOLO SU LÓGICA INTERNA ---
 
-def get_m3u8_from_streamwish(source_id):
+def get_m3u8_from_streamwish(source_id, timeout=25):
     # Streamwish es directo, solo llamamos al resolver genérico
-    return resolve_with_cloudscraper(f"https://streamwish.to/e/{source_id}")
+    return resolve_with_cloudscraper(f"https://streamwish.to/e/{source_id}", timeout)
 
-def get_m3u8_from_filemoon(source_id):
+def get_m3u8_from_filemoon(source_id, timeout=25):
     # Filemoon a menudo es directo también
-    return resolve_with_cloudscraper(f"https://filemoon.sx/e/{source_id}")
+    return resolve_with_cloudscraper(f"https://filemoon.sx/e/{source_id}", timeout)
     
-def get_m3u8_from_vidhide(source_id):
+def get_m3u8_from_vidhide(source_id, timeout=25):
     # Vidhide (anteriormente Filelions) a menudo usa URLs como /v/
-    return resolve_with_cloudscraper(f"https://filelions.to/v/{source_id}")
+    return resolve_with_cloudscraper(f"https://filelions.to/v/{source_id}", timeout)
+
+def get_m3u8_from_voesx(source_id, timeout=25):
+    return resolve_with_cloudscraper(f"https://voe.sx/e/{source_id}", timeout)
+
+# --- CACHÉ DE ENLACES RESUELTOS ---
+
+# (servidor, source_id) -> (m3u8 o None, expires_at), en orden LRU. None = fallo reciente (caché negativa).
+_resolved_cache = OrderedDict()
+_resolved_cache_lock = threading.Lock()
+# (servidor, source_id) -> {'event', 'result'} de la resolución en curso (una sola por clave).
+_inflight = {}
+
+# Margen para no servir un enlace que caduque mientras el reproductor lo abre.
+EXPIRY_MARGIN_SECONDS = 60
+
+def _m3u8_expiry(m3u8_url):
+    """
+    Momento de caducidad (epoch) que indica la propia URL, si lo indica:
+    'expires'/'exp' como epoch, o 's' (inicio) + 'e' (duración en segundos).
+    """
+    params = parse_qs(urlparse(m3u8_url).query)
+    def first_int(name):
+        try: return int(params[name][0])
+        except (KeyError, ValueError, IndexError): return None
+
+    for name in ('expires', 'exp'):
+        expiry = first_int(name)
+        if expiry and expiry > 1_000_000_000: return expiry
+    start, duration = first_int('s'), first_int('e')
+    # 's' y 'e' solo son caducidad si 's' es un epoch; si no, son otra cosa y manda el TTL por defecto.
+    if start and start > 1_000_000_000 and duration:
+        # Algunos hosts mandan en 'e' el epoch final en lugar de la duración.
+        return duration if duration > 1_000_000_000 else start + duration
+    return None
+
+def _resolved_ttl(m3u8_url):
+    """TTL para un enlace resuelto: lo que le queda según la URL, o RESOLVER_CACHE_TTL si no lo dice."""
+    default_ttl = getattr(settings, 'RESOLVER_CACHE_TTL', 600)
+    expiry = _m3u8_expiry(m3u8_url)
+    if expiry is None:
+        return default_ttl
+    return max(0, min(expiry - time.time() - EXPIRY_MARGIN_SECONDS, getattr(settings, 'RESOLVER_CACHE_MAX_TTL', 6 * 3600)))
+
+def _store_resolved(key, m3u8_url):
+    ttl = _resolved_ttl(m3u8_url) if m3u8_url else getattr(settings, 'RESOLVER_NEGATIVE_TTL', 30)
+    if ttl > 0:
+        with _resolved_cache_lock:
+            _resolved_cache[key] = (m3u8_url, time.monotonic() + ttl)
+            _resolved_cache.move_to_end(key)
+            while len(_resolved_cache) > getattr(settings, 'RESOLVER_CACHE_SIZE', 1000):
+                _resolved_cache.popitem(last=False)
+
+def cached_resolve(server_key, source_id, resolver_function, timeout=None):
+    """
+    Resuelve una fuente pasando por la caché: los enlaces se guardan hasta que caducan
+    y los fallos durante RESOLVER_NEGATIVE_TTL, para no repetir peticiones lentas.
+    Si ya hay una resolución en curso para la misma fuente no se lanza otra: se espera
+    a su resultado como mucho RESOLVER_COALESCE_TIMEOUT segundos.
+    'timeout' limita la petición al host (por defecto, la del resolver).
+    """
+    key = (server_key, source_id)
+    with _resolved_cache_lock:
+        entry = _resolved_cache.get(key)
+        if entry is not None and entry[1] > time.monotonic():
+            _resolved_cache.move_to_end(key)
+            print(f"--- [Caché] {'Enlace' if entry[0] else 'Fallo'} en caché para {server_key}/{source_id}")
+            return entry[0]
+        flight = _inflight.get(key)
+        is_leader = flight is None
+        if is_leader:
+            flight = _inflight[key] = {'event': threading.Event(), 'result': None}
+
+    if not is_leader:
+        print(f"--- [Caché] Esperando a la resolución en curso de {server_key}/{source_id}")
+        if not flight['event'].wait(getattr(settings, 'RESOLVER_COALESCE_TIMEOUT', 30)):
+            print(f"--- [Caché] Tiempo de espera agotado para {server_key}/{source_id}")
+            return None
+        return flight['result']
+
+    try:
+        flight['result'] = resolver_function(source_id, timeout) if timeout else resolver_function(source_id)
+        _store_resolved(key, flight['result'])
+    finally:
+        with _resolved_cache_lock:
+            _inflight.pop(key, None)
+        flight['event'].set()
+    return flight['result']
+
+# --- RESOLUCIÓN EN CARRERA DE VARIAS FUENTES ---
+
+# Hilos compartidos por todas las carreras. Las resoluciones abandonadas terminan aquí
+# en segundo plano (como mucho RESOLVER_SERVER_TIMEOUT) y dejan su resultado en caché.
+_race_executor = ThreadPoolExecutor(max_workers=getattr(settings, 'RESOLVER_RACE_WORKERS', 16), thread_name_prefix='resolver')
+
+def _cached_hit(key):
+    """Enlace ya resuelto y vigente en la caché, o None."""
+    with _resolved_cache_lock:
+        entry = _resolved_cache.get(key)
+        return entry[0] if entry is not None and entry[1] > time.monotonic() else None
+
+def _safe_cached_resolve(server_key, source_id, resolver_function, timeout):
+    try:
+        return cached_resolve(server_key, source_id, resolver_function, timeout)
+    except Exception as e:
+        print(f"--- [Carrera] ERROR resolviendo {server_key}/{source_id}: {type(e).__name__}: {e}")
+        return None
+
+def _race_group(candidates, deadline):
+    """
+    Carrera dentro de un grupo ya ordenado. Cuando una fuente funciona se espera como
+    mucho RESOLVER_RACE_GRACE segundos a las que van antes en la lista y aún están en
+    curso, y gana la primera de la lista que funcione. Devuelve (servidor, source_id, m3u8) o None.
+    """
+    # Si alguna candidata ya está en caché no hace falta lanzar nada (gana la preferida).
+    for server_key, source_id, *_ in candidates:
+        m3u8_url = _cached_hit((server_key, source_id))
+        if m3u8_url:
+            return server_key, source_id, m3u8_url
+
+    parallelism = getattr(settings, 'RESOLVER_RACE_PARALLELISM', 3)
+    server_timeout = getattr(settings, 'RESOLVER_SERVER_TIMEOUT', 8)
+    queue = list(enumerate(candidates))
+    # future -> (posición en la lista, servidor, source_id)
+    pending = {}
+    best = None
+    grace_deadline = None
+    try:
+        while True:
+            if best is None:
+                while queue and len(pending) < parallelism:
+                    position, (server_key, source_id, resolver_function, _) = queue.pop(0)
+                    future = _race_executor.submit(_safe_cached_resolve, server_key, source_id, resolver_function, server_timeout)
+                    pending[future] = (position, server_key, source_id)
+                waiting = list(pending)
+                until = deadline
+            else:
+                # Ya hay ganadora: solo se espera a las preferidas que siguen en curso.
+                waiting = [future for future, (position, *_) in pending.items() if position < best[0]]
+                until = min(deadline, grace_deadline)
+            if not waiting:
+                break
+            remaining = until - time.monotonic()
+            if remaining <= 0:
+                break
+            done, _ = wait(waiting, timeout=remaining, return_when=FIRST_COMPLETED)
+            for future in done:
+                position, server_key, source_id = pending.pop(future)
+                m3u8_url = future.result()
+                if m3u8_url and (best is None or position < best[0]):
+                    best = (position, server_key, source_id, m3u8_url)
+                    if grace_deadline is None:
+                        grace_deadline = time.monotonic() + getattr(settings, 'RESOLVER_RACE_GRACE', 1.5)
+    finally:
+        for future in pending:
+            future.cancel()
+    if best is None:
+        return None
+    print(f"--- [Carrera] Gana {best[1]}/{best[2]}.")
+    return best[1:]
 
-def get_m3u8_from_voesx(source_id):
-    return resolve_with_cloudscraper(f"https://voe.sx/e/{source_id}")
\ No newline at end of file
+def race_resolve(candidates):
+    """
+    Resuelve varias fuentes candidatas [(servidor, source_id, función, grupo)] en orden de
+    preferencia (el grupo es el idioma: la salud solo reordena dentro de cada uno).
+    Los idiomas van por turnos: solo si ninguna fuente del primero funciona se prueba el
+    siguiente. Dentro de un idioma corren como mucho RESOLVER_RACE_PARALLELISM a la vez,
+    con un plazo corto por servidor, y devuelve la preferida que funcione como
+    (servidor, source_id, m3u8). Las que no han empezado se cancelan; las que están en
+    curso se abandonan. Devuelve None si ninguna funciona antes de RESOLVER_RACE_TIMEOUT.
+    """
+    # Los idiomas en el orden recibido; dentro de cada uno, los servidores sanos y rápidos
+    # primero (a igualdad se respeta el orden recibido).
+    groups = {}
+    for candidate in candidates:
+        groups.setdefault(candidate[3], []).append(candidate)
+
+    deadline = time.monotonic() + getattr(settings, 'RESOLVER_RACE_TIMEOUT', 20)
+    for group in groups.values():
+        group.sort(key=lambda candidate: health_sort_key(candidate[0]))
+        winner = _race_group(group, deadline)
+        if winner:
+            return winner
+        if time.monotonic() >= deadline:
+            print("--- [Carrera] Plazo agotado sin ninguna fuente válida.")
+            return None
+    return None
@@ -0,0 +1,94 @@
+# Archivo: core/response_cache.py
+
+import hashlib
+import threading
+from collections import OrderedDict
+from functools import wraps
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseNotModified
+
+from . import data_manager
+
+# (espacio, versión, origen, ruta, query) -> (cuerpo, content_type, etag), en orden LRU. Cada
+# espacio (catálogo, fichas) tiene su propia versión y solo se vacía cuando cambia la suya.
+# El origen (esquema y host) va en la clave porque las páginas llevan URLs absolutas (canonical).
+_response_cache = OrderedDict()
+_response_cache_bytes = 0
+# espacio -> versión vigente
+_response_cache_versions = {}
+_response_cache_lock = threading.Lock()
+
+def _get_max_bytes():
+    return getattr(settings, 'RESPONSE_CACHE_MAX_BYTES', 32 * 1024 * 1024)
+
+def _cache_get(key):
+    global _response_cache_bytes
+    namespace, version = key[0], key[1]
+    with _response_cache_lock:
+        if _response_cache_versions.get(namespace) != version:
+            # Versión nueva: ninguna respuesta anterior de este espacio vuelve a servirse.
+            for stale_key in [cached_key for cached_key in _response_cache if cached_key[0] == namespace]:
+                _response_cache_bytes -= len(_response_cache.pop(stale_key)[0])
+            _response_cache_versions[namespace] = version
+        entry = _response_cache.get(key)
+        if entry is not None:
+            _response_cache.move_to_end(key)
+        return entry
+
+def _cache_put(key, entry):
+    global _response_cache_bytes
+    size = len(entry[0])
+    # Una página enorme no debe vaciar la caché entera.
+    if size > _get_max_bytes() // 8:
+        return
+    with _response_cache_lock:
+        if _response_cache_versions.get(key[0]) != key[1] or key in _response_cache:
+            return
+        _response_cache[key] = entry
+        _response_cache_bytes += size
+        while _response_cache_bytes > _get_max_bytes():
+            _, evicted = _response_cache.popitem(last=False)
+            _response_cache_bytes -= len(evicted[0])
+
+def _etag_matches(request, etag):
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH', '')
+    return if_none_match.strip() == '*' or etag in [tag.strip() for tag in if_none_match.split(',')]
+
+def cache_page_by_version(namespace, get_version):
+    """
+    Cachea el HTML de una vista que solo depende de la URL y de los datos que versiona
+    get_version(), así que una recarga con cambios invalida las páginas del espacio.
+    Responde con un ETag fuerte (hash del cuerpo) y 304 si el cliente ya lo tiene.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+
+            version = get_version()
+            origin = f"{request.scheme}://{request.get_host()}"
+            key = (namespace, version, origin, request.path, request.META.get('QUERY_STRING', ''))
+            entry = _cache_get(key)
+            if entry is None:
+                response = view(request, *args, **kwargs)
+                if response.status_code != 200 or response.streaming or response.cookies:
+                    return response
+                body = response.content
+                entry = (body, response['Content-Type'], f'"{hashlib.sha1(body).hexdigest()}"')
+                _cache_put(key, entry)
+
+            body, content_type, etag = entry
+            if _etag_matches(request, etag):
+                response = HttpResponseNotModified()
+            else:
+                response = HttpResponse(body, content_type=content_type)
+            response['ETag'] = etag
+            return response
+        return wrapper
+    return decorator
+
+# Listados: dependen de todo el catálogo.
+cache_page_by_catalog_version = cache_page_by_version('catalog', data_manager.get_catalog_version)
+# Fichas y episodios: solo de su ficha; en modo fragmentado no hace falta cargar los listados.
+cache_page_by_detail_version = cache_page_by_version('detail', data_manager.get_detail_version)
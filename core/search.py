@@ -0,0 +1,156 @@
+# Archivo: core/search.py
+
+import re
+import bisect
+import unicodedata
+from array import array
+from collections import Counter
+
+def normalize_text(text):
+    """Normaliza texto para búsquedas, quitando tildes y caracteres especiales."""
+    text = unicodedata.normalize('NFD', text).encode('ascii', 'ignore').decode('utf-8')
+    text = re.sub(r'[^a-z0-9\s]', '', text.lower())
+    return text
+
+def _searchable_texts(card):
+    """Título y título original normalizados (sin repetir si coinciden)."""
+    texts = [' '.join(normalize_text(card.title or '').split())]
+    original_title = ' '.join(normalize_text(card.original_title or '').split())
+    if original_title and original_title != texts[0]:
+        texts.append(original_title)
+    return texts
+
+def trigrams(text):
+    """Trigramas de cada palabra rellenada con espacios ('  ab', ' abc', 'bc '), como pg_trgm."""
+    grams = set()
+    for word in text.split():
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+# --- ÍNDICE DE PREFIJOS ---
+
+class PrefixIndex:
+    """
+    Tokens normalizados de los títulos en un array ordenado, cada uno con las posiciones
+    (en la vista 'all', de más nuevo a más antiguo) de los títulos que lo contienen.
+    Un prefijo se resuelve con dos bisect sobre el array de tokens, sin recorrer el
+    resto del catálogo.
+    """
+
+    def __init__(self, texts_by_position):
+        self.titles = [texts[0] for texts in texts_by_position]
+        postings = {}
+        for position, texts in enumerate(texts_by_position):
+            for token in set(' '.join(texts).split()):
+                postings.setdefault(token, array('I')).append(position)
+        self.tokens = sorted(postings)
+        self.postings = [postings[token] for token in self.tokens]
+
+    def _positions_with_prefix(self, prefix):
+        start = bisect.bisect_left(self.tokens, prefix)
+        # Los tokens solo tienen [a-z0-9], así que '\x7f' queda detrás de cualquier continuación.
+        end = bisect.bisect_left(self.tokens, prefix + '\x7f', start)
+        positions = set()
+        for token_postings in self.postings[start:end]:
+            positions.update(token_postings)
+        return positions
+
+    def _rank_key(self, position, normalized_query, words):
+        """Primero el título exacto, luego más palabras completas, luego el que empieza por la búsqueda; a igualdad, lo más nuevo."""
+        title = self.titles[position]
+        title_tokens = set(title.split())
+        whole_words = sum(1 for word in words if word in title_tokens)
+        return (title != normalized_query, -whole_words, not title.startswith(normalized_query), position)
+
+    def search(self, normalized_query):
+        """Posiciones cuyo título tiene, para cada palabra de la búsqueda, alguna palabra que empiece por ella."""
+        words = normalized_query.split()
+        matches = None
+        # Se empieza por la palabra más larga, que suele ser la más selectiva.
+        for word in sorted(set(words), key=len, reverse=True):
+            positions = self._positions_with_prefix(word)
+            matches = positions if matches is None else matches & positions
+            if not matches:
+                return []
+        return sorted(matches, key=lambda position: self._rank_key(position, normalized_query, words))
+
+# --- ÍNDICE DE TRIGRAMAS (TOLERANTE A ERRATAS) ---
+
+class TrigramIndex:
+    """
+    Listas de posiciones por trigrama (array('I'), compactas) sobre título y título
+    original. La similitud de un título es la fracción de trigramas de la búsqueda que
+    contiene, desempatando por Jaccard para preferir títulos de longitud parecida.
+    """
+
+    def __init__(self, texts_by_position):
+        postings = {}
+        # Cada texto (título u original) es un documento; doc -> posición de la tarjeta.
+        self.doc_positions = array('I')
+        self.doc_sizes = array('H')
+        for position, texts in enumerate(texts_by_position):
+            for text in texts:
+                grams = trigrams(text)
+                if not grams:
+                    continue
+                doc = len(self.doc_positions)
+                self.doc_positions.append(position)
+                self.doc_sizes.append(min(len(grams), 0xFFFF))
+                for gram in grams:
+                    postings.setdefault(gram, array('I')).append(doc)
+        self.postings = postings
+
+    def search(self, normalized_query, min_similarity):
+        """[(posición, similitud)] de mayor a menor similitud, sin posiciones repetidas."""
+        query_grams = trigrams(normalized_query)
+        if not query_grams:
+            return []
+        common = Counter()
+        for gram in query_grams:
+            doc_postings = self.postings.get(gram)
+            if doc_postings is not None:
+                common.update(doc_postings)
+
+        best = {}
+        for doc, shared in common.items():
+            coverage = shared / len(query_grams)
+            if coverage < min_similarity:
+                continue
+            jaccard = shared / (len(query_grams) + self.doc_sizes[doc] - shared)
+            position = self.doc_positions[doc]
+            score = (coverage, jaccard)
+            if score > best.get(position, (0, 0)):
+                best[position] = score
+        ranked = sorted(best.items(), key=lambda pair: (-pair[1][0], -pair[1][1], pair[0]))
+        return [(position, score[0]) for position, score in ranked]
+
+class SearchIndex:
+    """
+    Índices de búsqueda de una versión del catálogo. Se construyen junto al catálogo
+    (y viajan en su snapshot), así que buscar no recorre todos los títulos.
+    """
+
+    def __init__(self, cards):
+        self.cards = cards
+        texts_by_position = [_searchable_texts(card) for card in cards]
+        self.prefix = PrefixIndex(texts_by_position)
+        self.trigram = TrigramIndex(texts_by_position)
+
+    def search(self, query, limit, min_similarity):
+        """
+        Tarjetas ordenadas por relevancia: primero las que casan por prefijo (palabra a
+        palabra) y después las parecidas por trigramas, hasta 'limit' resultados.
+        """
+        normalized_query = ' '.join(normalize_text(query).split())
+        if not normalized_query:
+            return []
+        positions = self.prefix.search(normalized_query)[:limit]
+        if len(positions) < limit:
+            seen = set(positions)
+            for position, _ in self.trigram.search(normalized_query, min_similarity):
+                if position not in seen:
+                    positions.append(position)
+                    if len(positions) >= limit:
+                        break
+        return [self.cards[position] for position in positions]
@@ -0,0 +1,55 @@
+# Archivo: core/seo.py
+
+from django.utils.html import conditional_escape
+
+def build_keyword_paragraph(title, content_type):
+    """
+    Genera un párrafo de palabras clave para SEO, oculto para los usuarios.
+    Devuelve el HTML ya escapado; se calcula una vez por ficha al construir el catálogo.
+    """
+    title = conditional_escape(title or '')
+    content_type = content_type or ''
+    # Normaliza el tipo de contenido para usarlo en las frases
+    type_singular = "la película" if "Película" in content_type else "la serie"
+    type_generic = "Película" if "Película" in content_type else "Serie"
+
+    # Crea una lista de variaciones de palabras clave
+    keywords = [
+        f"Ver {title} Online",
+        f"{title} Online Gratis",
+        f"Disfrutar de {title} gratis",
+        f"{title} subtitulada",
+        f"Mirar {title} en HD",
+        f"{title} completo en español",
+        f"Ver {title} en latino",
+        f"{title} en castellano",
+        f"Ver {title} online gratis",
+        f"Ver {title} Gratis",
+        f"Ver online {title}",
+        f"Descargar {title} por Mega",
+        f"Ver {title} sin registrarse",
+        f"¿Dónde ver {title}?",
+        f"{title} en español",
+        f"{title} en línea",
+        f"Descargar {title} Online",
+        f"{type_generic} {title} completa",
+        f"{title} audio latino",
+        f"Ver {title} en HD 1080p",
+        f"{title} Gratis",
+        f"Ver {type_singular} {title} completa",
+    ]
+    
+    # Une todo en un solo párrafo
+    paragraph_text = ", ".join(keywords) + "."
+
+    # Envuelve el párrafo en un div con la clase CSS para ocultarlo visualmente.
+    # Esta clase ya la tenías en tu CSS original.
+    html_output = f'<div class="hidden-for-users"><p>{paragraph_text}</p></div>'
+    
+    return html_output
+
+def build_meta_description(item):
+    """Descripción para buscadores: el título y el principio de la sinopsis."""
+    overview = item.get('overview') or ''
+    overview_snippet = (overview[:155] + '...') if len(overview) > 155 else overview
+    return f"Mira {item.get('title')} online. Sinopsis: {overview_snippet}"
@@ -0,0 +1,102 @@
+# Archivo: core/sitemaps.py
+
+import gzip
+import io
+import threading
+from xml.sax.saxutils import escape
+from django.conf import settings
+from django.urls import reverse
+
+from . import data_manager
+
+SITEMAP_NS = 'http://www.sitemaps.org/schemas/sitemap/0.9'
+# Tipo de la tarjeta -> (sección del sitemap, nombre de la URL de detalle).
+DETAIL_SECTIONS = {'Película': ('movies', 'movie_detail'), 'Serie': ('series', 'series_detail'), 'Anime': ('anime', 'anime_detail')}
+
+# (versión del catálogo, {url base: {nombre: xml comprimido con gzip}})
+_sitemaps = (None, {})
+_sitemaps_lock = threading.Lock()
+
+def _detail_path_template(url_name):
+    """Ruta de detalle con {id} por rellenar (un solo reverse por tipo)."""
+    return reverse(url_name, args=[987654321]).replace('987654321', '{id}')
+
+def _iter_sections(catalog):
+    """(sección, ruta) de todas las URLs del sitemap, sección a sección."""
+    for url_name in ('home', 'movie_catalog', 'series_catalog', 'anime_catalog'):
+        yield 'pages', reverse(url_name)
+    for section, url_name in DETAIL_SECTIONS.values():
+        path_template = _detail_path_template(url_name)
+        for card in catalog['sorted']['all']:
+            if DETAIL_SECTIONS.get(card.type, (None,))[0] == section:
+                yield section, path_template.format(id=card.id)
+    if getattr(settings, 'SITEMAP_INCLUDE_EPISODES', False):
+        for path in data_manager.iter_episode_paths():
+            yield 'episodes', path
+
+class _GzipXmlWriter:
+    """Escribe un fichero XML directamente comprimido, en bloques, sin armar el texto entero en memoria."""
+
+    def __init__(self, root_tag):
+        self.buffer = io.BytesIO()
+        self.gzip_file = gzip.GzipFile(fileobj=self.buffer, mode='wb', mtime=0)
+        self.root_tag = root_tag
+        self.pending = [f'<?xml version="1.0" encoding="UTF-8"?><{root_tag} xmlns="{SITEMAP_NS}">']
+        self.count = 0
+
+    def add(self, fragment):
+        self.pending.append(fragment)
+        self.count += 1
+        if len(self.pending) >= 1000:
+            self.gzip_file.write(''.join(self.pending).encode('utf-8'))
+            self.pending = []
+
+    def close(self):
+        self.pending.append(f'</{self.root_tag}>')
+        self.gzip_file.write(''.join(self.pending).encode('utf-8'))
+        self.gzip_file.close()
+        return self.buffer.getvalue()
+
+def build_sitemaps(catalog, base_url):
+    """
+    Genera en una sola pasada los sitemaps hijos (por sección, con como mucho
+    SITEMAP_MAX_URLS URLs cada uno) y el índice que los enlaza. Devuelve
+    {nombre: xml comprimido}, donde 'index' es el índice (sitemap.xml).
+    """
+    max_urls = getattr(settings, 'SITEMAP_MAX_URLS', 50000)
+    files, names = {}, []
+    writer, current_section, part = None, None, 0
+
+    def flush():
+        if writer is not None:
+            name = f"{current_section}-{part}"
+            files[name] = writer.close()
+            names.append(name)
+
+    for section, path in _iter_sections(catalog):
+        if section != current_section or writer.count >= max_urls:
+            flush()
+            part = part + 1 if section == current_section else 1
+            current_section = section
+            writer = _GzipXmlWriter('urlset')
+        writer.add(f'<url><loc>{escape(base_url + path)}</loc></url>')
+    flush()
+
+    index_writer = _GzipXmlWriter('sitemapindex')
+    for name in names:
+        index_writer.add(f"<sitemap><loc>{escape(base_url + reverse('sitemap_section', args=[name]))}</loc></sitemap>")
+    files['index'] = index_writer.close()
+    return files
+
+def get_sitemaps(base_url):
+    """Sitemaps de la versión actual del catálogo para una URL base; se generan una vez por versión."""
+    global _sitemaps
+    catalog = data_manager.get_catalog()
+    with _sitemaps_lock:
+        if _sitemaps[0] != catalog['version']:
+            _sitemaps = (catalog['version'], {})
+        files = _sitemaps[1].get(base_url)
+        if files is None:
+            files = build_sitemaps(catalog, base_url)
+            _sitemaps[1][base_url] = files
+        return files
@@ -0,0 +1,33 @@
+# Archivo: core/sources.py
+
+# Orden de los idiomas en el reproductor; los que no estén aquí van detrás, en su orden original.
+LANGUAGE_PRIORITY = ["Latino", "Español", "Subtitulado"]
+# Orden de los servidores dentro de cada idioma; los desconocidos van al final.
+SERVER_PREFERENCE = ["MEGA", "SW", "Vidsrc", "Streamwish", "Filemoon", "Vidhide", "Netu", "Voesx", "Streamtape"]
+
+LANGUAGE_RANK = {lang: rank for rank, lang in enumerate(LANGUAGE_PRIORITY)}
+SERVER_RANK = {server: rank for rank, server in enumerate(SERVER_PREFERENCE)}
+
+def get_sorted_sources(sources_dict):
+    """
+    Toma el diccionario de fuentes y devuelve una lista de tuplas
+    ordenada según una prioridad de idiomas predefinida.
+    """
+    languages = sorted(sources_dict, key=lambda lang: LANGUAGE_RANK.get(lang, len(LANGUAGE_RANK)))
+    return [(lang, sources_dict[lang]) for lang in languages]
+
+def sort_sources_by_preference(sources_dict):
+    """
+    Ordena las fuentes de video dentro de cada idioma según una lista de preferencia.
+    """
+    return {
+        lang: sorted(sources_list, key=lambda source: SERVER_RANK.get(source.get('server_name'), len(SERVER_RANK)))
+        for lang, sources_list in sources_dict.items()
+    }
+
+def group_sources_by_lang(sources):
+    """[(idioma, [fuentes])] listo para pintar: agrupado por idioma y ordenado por preferencia."""
+    sources_dict = {}
+    for source in sources or []:
+        sources_dict.setdefault(source.get('language', 'Idioma Desconocido'), []).append(source)
+    return get_sorted_sources(sort_sources_by_preference(sources_dict))
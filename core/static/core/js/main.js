@@ -57,6 +57,42 @@ document.addEventListener('DOMContentLoaded', function() {
             playerMessageText.style.color = isError ? '#ff4d4d' : '#e0e0e0';
         }
 
+        function playM3u8(url) {
+            playerMessageOverlay.style.display = 'none';
+            videoElement.style.display = 'block';
+
+            if (Hls.isSupported()) {
+                hls.loadSource(url);
+                hls.attachMedia(videoElement);
+            } else if (videoElement.canPlayType('application/vnd.apple.mpegurl')) {
+                videoElement.src = url;
+            } else {
+                showMessage("Tu navegador no soporta streaming HLS.", true);
+            }
+        }
+
+        // Carga automática: el servidor prueba varias fuentes a la vez y devuelve la primera que funcione.
+        async function raceSourceButtons(buttons) {
+            showMessage("Buscando el mejor servidor...");
+            // g = grupo de idioma de cada fuente: el servidor solo reordena por salud dentro de cada idioma.
+            const groups = Array.from(playerAndOptions.querySelectorAll('.source-group'));
+            const params = buttons.map(btn => `s=${encodeURIComponent(`${btn.dataset.serverName}:${btn.dataset.sourceId}`)}&g=${groups.indexOf(btn.closest('.source-group'))}`).join('&');
+            try {
+                const response = await fetch(`/api/v1/resolve-race/?${params}`);
+                const data = await response.json();
+                if (!data.success || !data.url) throw new Error(data.error || "Ninguna fuente respondió.");
+
+                console.log(`¡Éxito! Gana ${data.server}:`, data.url);
+                const winner = buttons.find(btn => btn.dataset.serverName.toLowerCase() === data.server && btn.dataset.sourceId === data.source_id);
+                document.querySelectorAll('.source-button').forEach(btn => btn.classList.remove('active'));
+                if (winner) winner.classList.add('active');
+                playM3u8(data.url);
+            } catch (error) {
+                console.error("Error en la carga automática:", error);
+                showMessage(`No se pudo cargar automáticamente: ${error.message} Elige un servidor.`, true);
+            }
+        }
+
         async function handleSourceButtonClick(button) {
             const serverName = button.dataset.serverName;
             const sourceId = button.dataset.sourceId;
@@ -87,17 +123,7 @@ document.addEventListener('DOMContentLoaded', function() {
 
                 if (data.success && data.url) {
                     console.log("¡Éxito! M3U8 recibido:", data.url);
-                    playerMessageOverlay.style.display = 'none';
-                    videoElement.style.display = 'block';
-
-                    if (Hls.isSupported()) {
-                        hls.loadSource(data.url);
-                        hls.attachMedia(videoElement);
-                    } else if (videoElement.canPlayType('application/vnd.apple.mpegurl')) {
-                        videoElement.src = data.url;
-                    } else {
-                        showMessage("Tu navegador no soporta streaming HLS.", true);
-                    }
+                    playM3u8(data.url);
                 } else {
                     throw new Error(data.error || "La API no devolvió una URL válida.");
                 }
@@ -118,11 +144,13 @@ document.addEventListener('DOMContentLoaded', function() {
             // ... (tu lógica para cerrar otros menús desplegables se queda igual) ...
         });
 
-        // CARGA AUTOMÁTICA DEL PRIMER BOTÓN (se mantiene igual)
-        const firstSourceButton = playerAndOptions.querySelector('.source-button:not(.season-button)');
-        if (firstSourceButton) {
-            console.log("Iniciando carga automática del primer servidor...");
-            handleSourceButtonClick(firstSourceButton);
+        // CARGA AUTOMÁTICA: las fuentes en el orden de la página (ya vienen por preferencia)
+        const sourceButtons = Array.from(playerAndOptions.querySelectorAll('.source-button:not(.season-button)'))
+            .filter(btn => btn.dataset.serverName && btn.dataset.sourceId);
+        if (sourceButtons.length) {
+            console.log(`Iniciando carga automática entre ${sourceButtons.length} servidores...`);
+            // Se mandan todas: el servidor descarta las no soportadas y prueba los idiomas por turnos.
+            raceSourceButtons(sourceButtons);
         } else {
             showMessage("No hay fuentes de vídeo disponibles.", true);
         }
@@ -162,43 +190,16 @@ document.addEventListener('DOMContentLoaded', function() {
     const contentGrid = document.getElementById('content-grid');
     const loadingSpinner = document.getElementById('loading-spinner');
 
-    function createContentCard(item) {
-        const itemType = item.type || 'Película'; 
-        let detailUrl;
-        if (item.type === 'Película') {
-            detailUrl = `/pelicula/${item.id}/`;
-        } else if (item.type === 'Serie') {
-            detailUrl = `/serie/${item.id}/`;
-        } else { // Anime
-            detailUrl = `/anime/${item.id}/`;
-        }
-        let imageHtml = `<div class="no-poster"><span>${item.title}</span></div>`;
-        if (item.poster_path) {
-            const imageUrl = item.poster_path.startsWith('http')
-                ? item.poster_path
-                : `https://image.tmdb.org/t/p/w500${item.poster_path}`;
-            imageHtml = `<img src="${imageUrl}" alt="${item.title}" loading="lazy" class="card-image">`;
-        }
-        return `
-            <a href="${detailUrl}" class="content-card" data-title="${item.title}">
-                ${imageHtml}
-                <div class="card-overlay">
-                    <h3 class="card-title">${item.title}</h3>
-                    <span class="card-type">${itemType}</span>
-                </div>
-            </a>
-        `;
-    }
-
     if (loadMoreBtn && contentGrid) {
         loadMoreBtn.addEventListener('click', function() {
-            let page = this.getAttribute('data-page');
+            const cursor = this.getAttribute('data-cursor');
             const type = this.getAttribute('data-type');
             
             loadMoreBtn.style.display = 'none';
             if (loadingSpinner) loadingSpinner.style.display = 'block';
 
-            const url = `/cargar-mas/?page=${page}&type=${type}`;
+            const filters = this.getAttribute('data-filters');
+            const url = `/cargar-mas/?cursor=${encodeURIComponent(cursor)}&type=${encodeURIComponent(type)}` + (filters ? `&${filters}` : '');
             
             fetch(url)
                 .then(response => {
@@ -206,12 +207,10 @@ document.addEventListener('DOMContentLoaded', function() {
                     return response.json();
                 })
                 .then(data => {
-                    if (data.items && data.items.length > 0) {
-                        const allCardsHTML = data.items.map(item => createContentCard(item)).join('');
-                        contentGrid.insertAdjacentHTML('beforeend', allCardsHTML);
-                    }
-                    if (data.has_more) {
-                        this.setAttribute('data-page', parseInt(page) + 1);
+                    // El servidor manda las tarjetas ya renderizadas.
+                    if (data.html) contentGrid.insertAdjacentHTML('beforeend', data.html);
+                    if (data.has_more && data.next_cursor) {
+                        this.setAttribute('data-cursor', data.next_cursor);
                         loadMoreBtn.style.display = 'inline-block';
                     } else {
                         this.remove();
@@ -222,6 +221,54 @@ document.addEventListener('DOMContentLoaded', function() {
         });
     }
 
+    // --- 5b. AUTOCOMPLETADO DEL BUSCADOR ---
+    const searchInput = document.querySelector('.search-input[data-suggest-url]');
+    const suggestionsBox = document.getElementById('search-suggestions');
+    if (searchInput && suggestionsBox) {
+        let suggestTimer = null;
+        let suggestController = null;
+        const closeSuggestions = () => { suggestionsBox.classList.remove('open'); suggestionsBox.innerHTML = ''; };
+
+        searchInput.addEventListener('input', () => {
+            clearTimeout(suggestTimer);
+            const query = searchInput.value.trim();
+            if (query.length < 2) { closeSuggestions(); return; }
+            // Se espera a que el usuario deje de teclear y se cancela la petición anterior.
+            suggestTimer = setTimeout(() => {
+                if (suggestController) suggestController.abort();
+                suggestController = new AbortController();
+                fetch(`${searchInput.dataset.suggestUrl}?q=${encodeURIComponent(query)}`, { signal: suggestController.signal })
+                    .then(response => response.json())
+                    .then(data => {
+                        if (!data.suggestions.length) { closeSuggestions(); return; }
+                        // Se arma con nodos y textContent: los títulos pueden traer '<', '&' o comillas.
+                        suggestionsBox.replaceChildren(...data.suggestions.map(item => {
+                            const link = document.createElement('a');
+                            link.href = item.url;
+                            link.className = 'suggestion-item';
+                            if (item.poster) {
+                                const img = document.createElement('img');
+                                img.src = item.poster;
+                                img.alt = '';
+                                img.loading = 'lazy';
+                                link.appendChild(img);
+                            }
+                            const title = document.createElement('span');
+                            title.textContent = item.title;
+                            link.appendChild(title);
+                            return link;
+                        }));
+                        suggestionsBox.classList.add('open');
+                    })
+                    .catch(error => { if (error.name !== 'AbortError') console.error('Error en autocompletado:', error); });
+            }, 150);
+        });
+
+        document.addEventListener('click', (event) => {
+            if (!event.target.closest('.search-wrapper')) closeSuggestions();
+        });
+    }
+
     // --- 6. LÓGICA PARA MENÚS DESPLEGABLES (ACORDEÓN) ---
     function setupDropdowns(containerSelector) {
         const container = document.querySelector(containerSelector);
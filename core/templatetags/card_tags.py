@@ -0,0 +1,13 @@
+# Archivo: core/templatetags/card_tags.py
+
+from django import template
+from django.utils.safestring import mark_safe
+
+from core.card_fragments import render_cards_html
+
+register = template.Library()
+
+@register.simple_tag
+def content_cards(items):
+    """Pinta las tarjetas uniendo sus fragmentos ya renderizados (ver core/card_fragments.py)."""
+    return mark_safe(render_cards_html(items))
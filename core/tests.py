@@ -1,3 +1,210 @@
-from django.test import TestCase
+import re
+import json
+import time
+import hashlib
+import tempfile
+from collections import OrderedDict
+from unittest import mock
 
-# Create your tests here.
+from django.test import SimpleTestCase, override_settings
+
+from . import data_manager
+from . import resolver
+from . import response_cache
+
+
+def _item(content_id, content_type, release_date, genres):
+    return {'id': content_id, 'title': f"Título {content_id}", 'type': content_type, 'release_date': release_date, 'genres': genres}
+
+
+class LoadMoreCursorTests(SimpleTestCase):
+    """Paginación por cursor de /cargar-mas/ con y sin filtros de facetas."""
+
+    def setUp(self):
+        raw = {
+            'movies': [_item(i, 'Película', f"2020-01-{i:02d}", ['Acción' if i % 2 else 'Drama']) for i in range(1, 8)],
+            'series': [_item(100 + i, 'Serie', f"2020-02-{i:02d}", ['Acción']) for i in range(1, 5)],
+            'anime': [_item(200 + i, 'Anime', f"2020-03-{i:02d}", ['Drama']) for i in range(1, 3)],
+        }
+        catalog = data_manager.build_catalog({'test': raw}, 'test', with_details=True)
+        patcher = mock.patch.object(data_manager, 'get_catalog', return_value=catalog)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def fetch_all(self, query):
+        """Sigue next_cursor hasta el final y devuelve los ids en el orden servido."""
+        ids, cursor = [], None
+        for _ in range(20):
+            # Sin cursor la API empieza en la página 2 (la 1 va en el HTML); se pide la 1 para verlo todo.
+            url = f"/cargar-mas/?{query}&limit=2" + (f"&cursor={cursor}" if cursor else '&page=1')
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            data = json.loads(response.content)
+            ids.extend(int(content_id) for content_id in re.findall(r'href="/(?:pelicula|serie|anime)/(\d+)/"', data['html']))
+            cursor = data['next_cursor']
+            if not data['has_more']:
+                self.assertIsNone(cursor)
+                return ids
+        self.fail("La paginación no termina")
+
+    def test_catalog_type_is_not_a_filter(self):
+        self.assertEqual(len(self.fetch_all('type=all')), 13)
+        self.assertEqual(self.fetch_all('type=movies'), [7, 6, 5, 4, 3, 2, 1])
+
+    def test_cursor_paging_with_filters(self):
+        self.assertEqual(self.fetch_all('type=movies&genre=Acción'), [7, 5, 3, 1])
+        self.assertEqual(self.fetch_all('type=all&genre=Drama'), [202, 201, 6, 4, 2])
+        self.assertEqual(self.fetch_all('type=all&kind=series&kind=anime&genre=Acción'), [104, 103, 102, 101])
+
+    def test_filtered_pages_do_not_repeat_or_skip(self):
+        ids = self.fetch_all('type=all&kind=movies&kind=anime')
+        self.assertEqual(len(ids), len(set(ids)))
+        self.assertEqual(sorted(ids), [1, 2, 3, 4, 5, 6, 7, 201, 202])
+
+
+class ResolvedUrlExpiryTests(SimpleTestCase):
+    """El enlace extraído conserva su query, de la que sale el TTL de la caché de enlaces."""
+
+    def test_extracted_url_keeps_query(self):
+        m3u8_url = 'https://cdn.example.com/hls/master.m3u8?t=abc&s=1700000000&e=10800'
+        page = f'<script>var player = {{file:"{m3u8_url}"}};</script>'
+        self.assertEqual(resolver.scan_for_m3u8(iter([page])), m3u8_url)
+
+    def test_ttl_follows_expiry_in_url(self):
+        expires = int(time.time()) + 3600
+        ttl = resolver._resolved_ttl(f'https://cdn.example.com/hls/master.m3u8?token=x&expires={expires}')
+        self.assertAlmostEqual(ttl, 3600 - resolver.EXPIRY_MARGIN_SECONDS, delta=5)
+
+    @override_settings(RESOLVER_CACHE_TTL=600)
+    def test_small_s_and_e_are_not_an_expiry(self):
+        self.assertIsNone(resolver._m3u8_expiry('https://cdn.example.com/hls/master.m3u8?s=5&e=10'))
+        self.assertEqual(resolver._resolved_ttl('https://cdn.example.com/hls/master.m3u8?s=5&e=10'), 600)
+
+
+class _FakeResponse:
+    def __init__(self, status_code, content=b'', etag=None):
+        self.status_code = status_code
+        self.content = content
+        self.headers = {'ETag': etag} if etag else {}
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise data_manager.requests.HTTPError(f"{self.status_code}", response=self)
+
+
+class _FakeSession:
+    """Servidor de ficheros en memoria {url: bytes} con ETag y respuestas 304."""
+
+    def __init__(self):
+        self.files = {}
+
+    def get(self, url, timeout=None, headers=None):
+        if url not in self.files:
+            return _FakeResponse(404)
+        etag = f'"{hashlib.md5(self.files[url]).hexdigest()}"'
+        if (headers or {}).get('If-None-Match') == etag:
+            return _FakeResponse(304, etag=etag)
+        return _FakeResponse(200, self.files[url], etag)
+
+
+@override_settings(
+    CATALOG_MANIFEST_URL='http://shards.test/manifest.json', CATALOG_REFRESH_MODE='sync',
+    CATALOG_SNAPSHOT_DIR=tempfile.mkdtemp(), CATALOG_SNAPSHOT_BUNDLE_PATH=None,
+)
+class ShardedDetailTests(SimpleTestCase):
+    """En modo fragmentado una ficha se actualiza cuando el manifiesto publica otro fragmento."""
+
+    def setUp(self):
+        self.session = _FakeSession()
+        patchers = [
+            mock.patch.object(data_manager, '_get_http_session', return_value=self.session),
+            mock.patch.object(data_manager, '_raw_cache', {}),
+            mock.patch.object(data_manager, '_parsed_manifest', (None, {})),
+            mock.patch.object(data_manager, '_shard_cache', OrderedDict()),
+            mock.patch.object(data_manager, '_shard_fetch_locks', {}),
+            mock.patch.object(data_manager, '_catalog', None),
+            mock.patch.object(response_cache, '_response_cache', OrderedDict()),
+            mock.patch.object(response_cache, '_response_cache_versions', {}),
+            mock.patch.object(response_cache, '_response_cache_bytes', 0),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def publish(self, title):
+        shard = json.dumps({'movies': [{'id': 1, 'title': title, 'type': 'Película'}]}).encode()
+        manifest = {'listing': [], 'shards': [
+            {'url': 'movies-0000.json', 'type': 'movies', 'min_id': 1, 'max_id': 1, 'digest': hashlib.sha1(shard).hexdigest()[:12]},
+        ]}
+        self.session.files['http://shards.test/movies-0000.json'] = shard
+        self.session.files['http://shards.test/manifest.json'] = json.dumps(manifest).encode()
+
+    def test_new_shard_replaces_cached_detail(self):
+        self.publish('Old Title')
+        self.assertContains(self.client.get('/pelicula/1/'), 'Old Title')
+
+        self.publish('New Title')
+        # Caduca el manifiesto, pero no el fragmento que ya está en caché.
+        data_manager._raw_cache[data_manager.MANIFEST_KEY]['expires_at'] = 0
+        response = self.client.get('/pelicula/1/')
+        self.assertContains(response, 'New Title')
+        self.assertNotContains(response, 'Old Title')
+        self.assertContains(self.client.get('/pelicula/1/'), 'New Title')
+
+
+class ResolveRaceTests(SimpleTestCase):
+    """Carrera de fuentes: idiomas por turnos y, dentro de uno, gana la preferida."""
+
+    def setUp(self):
+        for patcher in (mock.patch.dict(resolver._resolved_cache, clear=True), mock.patch.dict(resolver._host_health, clear=True)):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    @staticmethod
+    def source(delay, works):
+        def resolve(source_id, timeout=None):
+            time.sleep(delay)
+            return f"https://cdn.example.com/{source_id}.m3u8" if works else None
+        return resolve
+
+    def test_unsupported_servers_do_not_fill_the_cap(self):
+        query = '&'.join(['s=MEGA:m&g=0'] * 10 + ['s=Filemoon:f1&g=0', 's=Voesx:v1&g=1'])
+        with mock.patch.object(resolver, 'race_resolve', return_value=('filemoon', 'f1', 'https://cdn.example.com/f1.m3u8')) as race:
+            response = self.client.get(f'/api/v1/resolve-race/?{query}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([(server, source_id, group) for server, source_id, _, group in race.call_args.args[0]], [('filemoon', 'f1', '0'), ('voesx', 'v1', '1')])
+
+    @override_settings(RESOLVER_RACE_GRACE=1)
+    def test_preferred_source_wins_within_grace(self):
+        candidates = [('filemoon', 'lat1', self.source(0.3, True), '0'), ('sw', 'lat2', self.source(0.01, True), '0'), ('voesx', 'sub1', self.source(0, True), '1')]
+        self.assertEqual(resolver.race_resolve(candidates), ('filemoon', 'lat1', 'https://cdn.example.com/lat1.m3u8'))
+
+    def test_next_language_only_when_first_fails(self):
+        candidates = [('filemoon', 'lat1', self.source(0, False), '0'), ('voesx', 'sub1', self.source(0, True), '1')]
+        self.assertEqual(resolver.race_resolve(candidates), ('voesx', 'sub1', 'https://cdn.example.com/sub1.m3u8'))
+
+
+class CircuitBreakerTests(SimpleTestCase):
+    """Un host que responde cierra su circuito aunque el vídeo concreto no exista."""
+
+    def setUp(self):
+        patcher = mock.patch.dict(resolver._host_health, clear=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @override_settings(RESOLVER_BREAKER_THRESHOLD=2, RESOLVER_BREAKER_COOLDOWN=60)
+    def test_half_open_trial_with_404_closes_breaker(self):
+        for _ in range(2):
+            resolver._record_result('host.test', False, 1)
+        self.assertFalse(resolver._allow_request('host.test'))
+
+        # Pasado el enfriamiento la petición de prueba recibe un 404.
+        resolver._host_health['host.test']['open_until'] = time.monotonic() - 1
+        not_found = mock.MagicMock(status_code=404)
+        not_found.__enter__.return_value = not_found
+        not_found.raise_for_status.side_effect = resolver.requests.HTTPError('404', response=_FakeResponse(404))
+        with mock.patch.object(resolver.scraper, 'get', return_value=not_found):
+            self.assertIsNone(resolver.resolve_with_cloudscraper('https://host.test/e/borrado'))
+
+        self.assertTrue(resolver._allow_request('host.test'))
+        self.assertEqual(resolver._host_health['host.test']['failures'], 0)
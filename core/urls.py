@@ -33,12 +33,16 @@ urlpatterns = [
 
     # URLs de utilidades y API
     path('buscar/', views.search, name='search'),
+    path('buscar/sugerencias/', views.search_suggestions, name='search_suggestions'),
     path('cargar-mas/', views.load_more, name='load_more'),
     path('sitemap.xml', views.sitemap_view, name='sitemap'),
+    path('sitemap-<slug:section>.xml', views.sitemap_section_view, name='sitemap_section'),
     
     # --- RUTA DE LA API CORREGIDA ---
     # Apunta a la nueva función 'resolve_source_api' en views.py
     path('api/v1/resolve/<str:server_name>/<str:source_id>/', views.resolve_source_api, name='resolve_source_api'),
+    # Resuelve varias fuentes en paralelo y devuelve la primera que funcione (?s=Servidor:ID)
+    path('api/v1/resolve-race/', views.resolve_race_api, name='resolve_race_api'),
 
     # Ruta del proxy de M3U8 (se mantiene igual)
     path('proxy-stream/<path:b64_url>/', views.stream_proxy_view, name='stream_proxy'),
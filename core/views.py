@@ -4,89 +4,92 @@
 # 1. IMPORTS
 # -----------------------------------------------------------------
 # Imports de Django
+from django.conf import settings
 from django.shortcuts import render, reverse
 from django.http import Http404, JsonResponse, HttpResponse, HttpResponseRedirect
 from django.views.decorators.csrf import csrf_exempt
 
 # Imports de librerías estándar
-import unicodedata
-import re
+import gzip
+import json
 import requests
 import base64
-from urllib.parse import urljoin
+from urllib.parse import urljoin, urlencode
 
 # Imports locales del proyecto
 from . import data_manager
+from .facets import FACETS, FACET_PARAMS
 from . import resolver
+from . import sitemaps
+from .card_fragments import render_cards_json
+from .response_cache import cache_page_by_catalog_version, cache_page_by_detail_version
 
 # -----------------------------------------------------------------
 # 2. FUNCIONES DE AYUDA (HELPERS)
 # -----------------------------------------------------------------
-def get_sorted_sources(sources_dict):
-    """
-    Toma el diccionario de fuentes y devuelve una lista de tuplas
-    ordenada según una prioridad de idiomas predefinida.
-    """
-    language_priority = ["Latino", "Español", "Subtitulado"]
-    sorted_list = []
-    
-    for lang in language_priority:
-        if lang in sources_dict:
-            sorted_list.append((lang, sources_dict[lang]))
-            
-    for lang, sources in sources_dict.items():
-        if lang not in language_priority:
-            sorted_list.append((lang, sources))
-            
-    return sorted_list
+FACET_LABELS = {'type': 'Tipo', 'genre': 'Género', 'year': 'Año', 'language': 'Idioma'}
+TYPE_LABELS = {'movies': 'Películas', 'series': 'Series', 'anime': 'Anime'}
 
-def sort_sources_by_preference(sources_dict):
-    """
-    Ordena las fuentes de video dentro de cada idioma según una lista de preferencia.
-    """
-    server_preference = ["MEGA", "SW", "Vidsrc", "Streamwish", "Filemoon", "Vidhide", "Netu", "Voesx", "Streamtape"]
-    sorted_dict = {}
-    for lang, sources_list in sources_dict.items():
-        sorted_list = sorted(
-            sources_list, 
-            key=lambda x: server_preference.index(x.get('server_name')) if x.get('server_name') in server_preference else len(server_preference)
-        )
-        sorted_dict[lang] = sorted_list
-    return sorted_dict
-
-def normalize_text(text):
-    """Normaliza texto para búsquedas, quitando tildes y caracteres especiales."""
-    text = unicodedata.normalize('NFD', text).encode('ascii', 'ignore').decode('utf-8')
-    text = re.sub(r'[^a-z0-9\s]', '', text.lower())
-    return text
+def get_filters(request):
+    """Filtros de facetas de la URL (?genre=&year=&language=&kind=). Varios valores de una faceta se combinan con OR."""
+    filters = {}
+    for facet in FACETS:
+        values = [value for value in request.GET.getlist(FACET_PARAMS[facet]) if value]
+        if values:
+            filters[facet] = values
+    return filters
+
+def build_facet_options(content_type, filters):
+    """Opciones de cada filtro con su recuento, para el formulario de filtros del catálogo."""
+    counts = data_manager.get_facet_counts(content_type, filters)
+    facet_options = []
+    for facet in FACETS:
+        # En los catálogos de un solo tipo el filtro de tipo no aporta nada.
+        if facet == 'type' and content_type != 'all': continue
+        values = counts[facet]
+        selected = filters.get(facet, [])
+        ordered = sorted(values, reverse=(facet == 'year'))
+        facet_options.append({
+            'name': FACET_PARAMS[facet], 'label': FACET_LABELS[facet],
+            'options': [{'value': value, 'label': TYPE_LABELS.get(value, value), 'count': values[value], 'selected': value in selected} for value in ordered],
+        })
+    return facet_options
 
 # -----------------------------------------------------------------
 # 3. VISTAS PRINCIPALES DE PÁGINAS (HTML)
 # -----------------------------------------------------------------
+def render_catalog(request, content_type, page_title):
+    """Renderiza un catálogo (primera página + filtros). El resto llega por /cargar-mas/."""
+    filters = get_filters(request)
+    content, next_cursor = data_manager.get_content_page(content_type, limit=40, filters=filters)
+    context = {
+        'content': content, 'page_title': page_title, 'content_type': content_type, 'has_more': next_cursor is not None, 'next_cursor': next_cursor,
+        'facets': build_facet_options(content_type, filters),
+        'filter_query': urlencode({FACET_PARAMS[facet]: values for facet, values in filters.items()}, doseq=True),
+    }
+    return render(request, 'core/home.html', context)
+
+@cache_page_by_catalog_version
 def home(request):
     """Página principal con las últimas publicaciones."""
-    latest_content, has_more = data_manager.get_paginated_content('all', page=1, per_page=40)
-    context = {'content': latest_content, 'page_title': 'Últimas Novedades', 'content_type': 'all', 'has_more': has_more}
-    return render(request, 'core/home.html', context)
+    return render_catalog(request, 'all', 'Últimas Novedades')
 
+@cache_page_by_catalog_version
 def movie_catalog(request):
     """Catálogo de todas las películas."""
-    movies, has_more = data_manager.get_paginated_content('movies', page=1, per_page=40)
-    context = {'content': movies, 'page_title': 'Películas', 'content_type': 'movies', 'has_more': has_more}
-    return render(request, 'core/home.html', context)
+    return render_catalog(request, 'movies', 'Películas')
 
+@cache_page_by_catalog_version
 def series_catalog(request):
     """Catálogo de todas las series."""
-    series, has_more = data_manager.get_paginated_content('series', page=1, per_page=40)
-    context = {'content': series, 'page_title': 'Series', 'content_type': 'series', 'has_more': has_more}
-    return render(request, 'core/home.html', context)
+    return render_catalog(request, 'series', 'Series')
 
+@cache_page_by_catalog_version
 def anime_catalog(request):
     """Catálogo de todos los animes."""
-    animes, has_more = data_manager.get_paginated_content('anime', page=1, per_page=40)
-    context = {'content': animes, 'page_title': 'Anime', 'content_type': 'anime', 'has_more': has_more}
-    return render(request, 'core/home.html', context)
+    return render_catalog(request, 'anime', 'Anime')
 
+@cache_page_by_detail_version
 def content_detail(request, content_id, content_type):
     """Página de detalle para películas, series y anime."""
     content = None
@@ -96,66 +99,37 @@ def content_detail(request, content_id, content_type):
         content = data_manager.find_series_by_id(content_id)
 
     if not content:
-        # Intenta buscar en el otro tipo por si la URL es incorrecta
-        if content_type != 'movie': content = data_manager.find_movie_by_id(content_id)
-        if content_type == 'movie': content = data_manager.find_series_by_id(content_id)
+        # Intenta buscar en el otro tipo por si la URL es incorrecta (una sola consulta al índice combinado)
+        content = data_manager.find_content_by_id(content_id)
     
     if not content: raise Http404("Contenido no encontrado")
 
     real_content_type = 'movie' if content.get('type') == 'Película' else content.get('type', 'series').lower()
 
-    sources_by_lang = {}
-    if real_content_type == 'movie':
-        for source in content.get('sources', []):
-            lang = source.get('language', 'Idioma Desconocido')
-            if lang not in sources_by_lang: sources_by_lang[lang] = []
-            sources_by_lang[lang].append(source)
-        
-        sources_by_lang = sort_sources_by_preference(sources_by_lang)
-        sources_by_lang = get_sorted_sources(sources_by_lang)
-    
-    overview_snippet = (content['overview'][:155] + '...') if len(content.get('overview', '')) > 155 else content.get('overview', '')
-    meta_description = f"Mira {content['title']} online. Sinopsis: {overview_snippet}"
-    
+    # Fuentes ya agrupadas por idioma y ordenadas al construir el catálogo.
+    sources_by_lang = content.get('sources_by_lang', []) if real_content_type == 'movie' else {}
+
     context = {
         'content': content, 'page_title': content['title'],
         'sources_by_lang': sources_by_lang, 'is_movie': real_content_type == 'movie',
-        'content_type': real_content_type, 'meta_description': meta_description,
+        'content_type': real_content_type, 'meta_description': content.get('meta_description'),
+        'canonical_url': request.build_absolute_uri(content['canonical_path']),
     }
     return render(request, 'core/detail_page.html', context)
 
+@cache_page_by_detail_version
 def episode_player_view(request, content_id, season_number, episode_number):
     """Página del reproductor de episodios para series y animes."""
     content = data_manager.find_series_by_id(content_id)
     if not content: raise Http404("Serie o anime no encontrado")
 
-    current_episode, prev_link, next_link = None, None, None
-    all_episodes_flat = []
-    if content.get('seasons'):
-        for season in content['seasons']:
-            if season.get('episodes'):
-                for episode in season['episodes']:
-                    all_episodes_flat.append({'series_id': content_id, 'season_number': season.get('season_number'), 'episode_number': episode.get('episode_number'), 'data': episode})
-
-    url_name_base = 'anime_episode_player' if content.get('type') == 'Anime' else 'series_episode_player'
-    
-    for i, ep_flat in enumerate(all_episodes_flat):
-        if ep_flat['season_number'] == season_number and ep_flat['episode_number'] == episode_number:
-            current_episode = ep_flat['data']
-            if i > 0: prev_link = reverse(url_name_base, args=[all_episodes_flat[i - 1]['series_id'], all_episodes_flat[i - 1]['season_number'], all_episodes_flat[i - 1]['episode_number']])
-            if i < len(all_episodes_flat) - 1: next_link = reverse(url_name_base, args=[all_episodes_flat[i + 1]['series_id'], all_episodes_flat[i + 1]['season_number'], all_episodes_flat[i + 1]['episode_number']])
-            break
-
-    if not current_episode: raise Http404("Episodio no encontrado")
-
-    sources_by_lang = {}
-    for source in current_episode.get('sources', []):
-        lang = source.get('language', 'Idioma Desconocido')
-        if lang not in sources_by_lang: sources_by_lang[lang] = []
-        sources_by_lang[lang].append(source)
+    # Posición del episodio y enlaces anterior/siguiente, precalculados al construir el catálogo.
+    episode_nav = content.get('episode_nav', {}).get((season_number, episode_number))
+    if not episode_nav: raise Http404("Episodio no encontrado")
+    season_pos, episode_pos, prev_link, next_link = episode_nav
+    current_episode = content['seasons'][season_pos]['episodes'][episode_pos]
 
-    sources_by_lang = sort_sources_by_preference(sources_by_lang)
-    sources_by_lang = get_sorted_sources(sources_by_lang)
+    sources_by_lang = current_episode.get('sources_by_lang', [])
 
     detail_url_name = 'anime_detail' if content.get('type') == 'Anime' else 'series_detail'
     
@@ -163,7 +137,8 @@ def episode_player_view(request, content_id, season_number, episode_number):
         'series': content, 'episode': current_episode, 'season_number': season_number,
         'episode_number': episode_number, 'page_title': f"{content['title']} - T{season_number}:E{episode_number}",
         'sources_by_lang': sources_by_lang, 'enlace_anterior': prev_link, 'enlace_siguiente': next_link,
-        'enlace_lista_episodios': reverse(detail_url_name, args=[content_id])
+        'enlace_lista_episodios': reverse(detail_url_name, args=[content_id]),
+        'canonical_url': request.build_absolute_uri(request.path),
     }
     return render(request, 'core/episode_player.html', context)
 
@@ -174,43 +149,79 @@ def episode_player_view(request, content_id, season_number, episode_number):
 def search(request):
     """Vista para la funcionalidad de búsqueda."""
     query = request.GET.get('q', '').strip()
-    results = []
-    if query:
-        normalized_query = normalize_text(query)
-        for item in data_manager.get_all_content():
-            normalized_title = normalize_text(item['title'])
-            if normalized_title.startswith(normalized_query) or any(word.startswith(normalized_query) for word in normalized_title.split()):
-                results.append(item)
-    context = {'content': results, 'page_title': f'Resultados para "{query}"' if query else 'Búsqueda', 'is_search': True, 'query': query}
+    try:
+        page = max(int(request.GET.get('page', 1)), 1)
+    except ValueError:
+        page = 1
+    results, has_next = data_manager.search_content(query, page=page, per_page=40) if query else ([], False)
+    context = {
+        'content': results, 'page_title': f'Resultados para "{query}"' if query else 'Búsqueda', 'is_search': True, 'query': query,
+        'search_page': page, 'search_prev_page': page - 1 if page > 1 else None, 'search_next_page': page + 1 if has_next else None,
+    }
     return render(request, 'core/home.html', context)
 
+def search_suggestions(request):
+    """API de autocompletado para el buscador: las primeras sugerencias (id, título, póster, url) de ?q=."""
+    query = request.GET.get('q', '').strip()
+    max_limit = settings.SEARCH_SUGGESTIONS_LIMIT
+    try:
+        limit = min(max(int(request.GET.get('limit', max_limit)), 1), max_limit)
+    except ValueError:
+        limit = max_limit
+    suggestions = data_manager.suggest_content(query, limit) if len(query) >= 2 else b'[]'
+    return HttpResponse(b'{"suggestions":' + suggestions + b'}', content_type='application/json')
+
 def load_more(request):
-    """API para la paginación infinita."""
-    page = int(request.GET.get('page', 2))
+    """
+    API para la paginación infinita. Se pagina por cursor (?cursor=...): cada respuesta
+    trae el 'next_cursor' de la siguiente. '?page=' se mantiene por compatibilidad.
+    El tamaño de página (?limit=) está limitado por LOAD_MORE_MAX_PAGE_SIZE.
+    """
     content_type = request.GET.get('type', 'all')
-    items, has_more = data_manager.get_paginated_content(content_type, page=page, per_page=40) 
-    return JsonResponse({'items': items, 'has_more': has_more})
+    cursor = request.GET.get('cursor')
+    # ?type= es el tipo del catálogo; los filtros de facetas llegan aparte (el de tipo en ?kind=).
+    filters = get_filters(request)
+    try:
+        limit = min(int(request.GET.get('limit', 40)), settings.LOAD_MORE_MAX_PAGE_SIZE)
+        if limit < 1: raise ValueError("limit debe ser positivo")
+        if cursor:
+            items, next_cursor = data_manager.get_content_page(content_type, cursor=cursor, limit=limit, filters=filters)
+            has_more = next_cursor is not None
+        else:
+            page = int(request.GET.get('page', 2))
+            if page < 1: raise ValueError("page debe ser positivo")
+            items, has_more = data_manager.get_paginated_content(content_type, page=page, per_page=limit, filters=filters)
+            next_cursor = data_manager.encode_cursor(items[-1]) if has_more and items else None
+    except ValueError as e:
+        return JsonResponse({'error': f'Parámetros de paginación inválidos: {e}'}, status=400)
+    # Las tarjetas van solo como HTML: los fragmentos cacheados que usan también las plantillas.
+    body = b''.join([
+        b'{"html":', render_cards_json(items).encode('utf-8'),
+        b',"has_more":', b'true' if has_more else b'false',
+        b',"next_cursor":', json.dumps(next_cursor).encode(), b'}',
+    ])
+    return HttpResponse(body, content_type='application/json')
+
+def sitemap_response(request, name):
+    """Sirve un sitemap ya generado (comprimido) para la versión actual del catálogo."""
+    files = sitemaps.get_sitemaps(request.build_absolute_uri('/').rstrip('/'))
+    body = files.get(name)
+    if body is None: raise Http404("Sitemap no encontrado")
+    if 'gzip' in request.META.get('HTTP_ACCEPT_ENCODING', ''):
+        response = HttpResponse(body, content_type='application/xml')
+        response['Content-Encoding'] = 'gzip'
+    else:
+        response = HttpResponse(gzip.decompress(body), content_type='application/xml')
+    response['Vary'] = 'Accept-Encoding'
+    return response
 
 def sitemap_view(request):
-    """Genera el sitemap.xml."""
-    all_content = data_manager.get_all_content()
-    urls = [
-        request.build_absolute_uri(reverse('home')),
-        request.build_absolute_uri(reverse('movie_catalog')),
-        request.build_absolute_uri(reverse('series_catalog')),
-        request.build_absolute_uri(reverse('anime_catalog'))
-    ]
-    for item in all_content:
-        url_name = ''
-        if item['type'] == 'Película': url_name = 'movie_detail'
-        elif item['type'] == 'Serie': url_name = 'series_detail'
-        elif item['type'] == 'Anime': url_name = 'anime_detail'
-        if url_name: urls.append(request.build_absolute_uri(reverse(url_name, args=[item['id']])))
-    
-    sitemap_content = '<?xml version="1.0" encoding="UTF-8"?><urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
-    for url in urls: sitemap_content += f'<url><loc>{url}</loc></url>'
-    sitemap_content += '</urlset>'
-    return HttpResponse(sitemap_content, content_type='application/xml')
+    """Índice de sitemaps (sitemap.xml): enlaza los sitemaps de cada sección."""
+    return sitemap_response(request, 'index')
+
+def sitemap_section_view(request, section):
+    """Un sitemap hijo (páginas, películas, series, anime o episodios), por partes de tamaño limitado."""
+    return sitemap_response(request, section)
 
 def stream_proxy_view(request, b64_url):
     """Proxy para reescribir manifiestos M3U8 y evitar bloqueos de Referer."""
@@ -270,11 +281,38 @@ def resolve_source_api(request, server_name, source_id):
         print(f"--- [API RESOLVER] Error: Servidor '{server_name}' no soportado.")
         return JsonResponse({'success': False, 'error': f'Servidor "{server_name}" no soportado.'}, status=400)
 
-    m3u8_url = resolver_function(source_id)
+    m3u8_url = resolver.cached_resolve(server_name_lower, source_id, resolver_function)
     
     if m3u8_url:
         print(f"--- [API RESOLVER] Éxito. M3U8 encontrado.")
         return JsonResponse({'success': True, 'url': m3u8_url})
     else:
         print(f"--- [API RESOLVER] Fallo. No se pudo resolver la fuente.")
-        return JsonResponse({'success': False, 'error': f'No se pudo resolver la fuente para {server_name}.'}, status=404)
\ No newline at end of file
+        return JsonResponse({'success': False, 'error': f'No se pudo resolver la fuente para {server_name}.'}, status=404)
+
+def resolve_race_api(request):
+    """
+    Resuelve a la vez varias fuentes candidatas (?s=Servidor:ID, repetido y en orden de
+    preferencia) y devuelve la primera que funcione. Las no soportadas se ignoran.
+    ?g= (uno por cada ?s=, en el mismo orden) indica el grupo de idioma de cada fuente.
+    """
+    groups = request.GET.getlist('g')
+    candidates = []
+    for position, candidate in enumerate(request.GET.getlist('s')):
+        server_name, _, source_id = candidate.partition(':')
+        resolver_function = RESOLVER_MAP.get(server_name.lower())
+        if resolver_function and source_id:
+            group = groups[position] if position < len(groups) else ''
+            candidates.append((server_name.lower(), source_id, resolver_function, group))
+    # El límite se aplica tras descartar las no soportadas, para que no ocupen los huecos.
+    candidates = candidates[:settings.RESOLVER_RACE_MAX_CANDIDATES]
+
+    if not candidates:
+        return JsonResponse({'success': False, 'error': 'Ninguna de las fuentes es de un servidor soportado.'}, status=400)
+
+    print(f"--- [API RESOLVER] Carrera entre {len(candidates)} fuentes ---")
+    winner = resolver.race_resolve(candidates)
+    if not winner:
+        return JsonResponse({'success': False, 'error': 'No se pudo resolver ninguna de las fuentes.'}, status=404)
+    server_name, source_id, m3u8_url = winner
+    return JsonResponse({'success': True, 'url': m3u8_url, 'server': server_name, 'source_id': source_id})
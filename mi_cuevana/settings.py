@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
 import os
+import tempfile
 from pathlib import Path
 from dotenv import load_dotenv
 from django.core.management.utils import get_random_secret_key
@@ -173,4 +174,95 @@ GITHUB_RAW_URLS = {
     'raw1': "https://raw.githubusercontent.com/DermisZabala/data1/refs/heads/master/data1.json",
     'raw2': "https://raw.githubusercontent.com/DermisZabala/data2/refs/heads/master/data2.json",
     'raw3': "https://raw.githubusercontent.com/DermisZabala/data3/refs/heads/master/data3.json",
-}
\ No newline at end of file
+}
+# Timeout en segundos (conexión, lectura) al descargar cada raw. Si un raw necesita
+# un valor distinto se puede indicar en GITHUB_RAW_TIMEOUTS, p. ej. {'raw3': (3.05, 20)}.
+GITHUB_RAW_TIMEOUT = (3.05, 10)
+GITHUB_RAW_TIMEOUTS = {}
+
+# A partir de cuántos segundos se reporta en los logs que un raw respondió lento.
+GITHUB_RAW_SLOW_SECONDS = 3
+
+# Caché del catálogo: cada cuántos segundos se revalidan los raws contra GitHub
+# (petición condicional con ETag, un 304 no descarga nada) y durante cuántos
+# segundos se recuerda un fallo antes de reintentar.
+CATALOG_CACHE_TTL = int(os.environ.get('CATALOG_CACHE_TTL', 300))
+CATALOG_NEGATIVE_TTL = int(os.environ.get('CATALOG_NEGATIVE_TTL', 30))
+
+# Cómo se recarga el catálogo cuando caduca: 'background' sigue sirviendo el
+# snapshot actual mientras un worker prepara el siguiente; 'sync' hace esperar
+# a la petición que encuentra el catálogo caducado.
+CATALOG_REFRESH_MODE = os.environ.get('CATALOG_REFRESH_MODE', 'background')
+
+# Snapshot compilado del catálogo. Tras cada construcción se guarda en
+# CATALOG_SNAPSHOT_DIR (debe ser escribible; en Vercel solo lo es /tmp) y al
+# arrancar se carga antes de revalidar contra GitHub en segundo plano. La carpeta
+# se crea privada (0o700) y un snapshot ajeno o con permisos abiertos se ignora.
+# CATALOG_SNAPSHOT_BUNDLE_PATH es el que genera "manage.py build_catalog_snapshot"
+# durante el build para que viaje dentro del despliegue.
+CATALOG_SNAPSHOT_DIR = Path(os.environ.get('CATALOG_SNAPSHOT_DIR', Path(tempfile.gettempdir()) / 'domoflix_catalog'))
+CATALOG_SNAPSHOT_BUNDLE_PATH = BASE_DIR / 'catalog_snapshot' / 'catalog.pickle'
+
+# Tamaño máximo de página que acepta /cargar-mas/ (?limit=).
+LOAD_MORE_MAX_PAGE_SIZE = 100
+
+# Catálogo fragmentado (opcional). Si se define, en lugar de GITHUB_RAW_URLS se usa
+# un manifiesto con los listados (solo tarjetas) y los fragmentos de fichas por rango
+# de id, que se descargan bajo demanda. Se genera con "manage.py build_catalog_shards".
+CATALOG_MANIFEST_URL = os.environ.get('CATALOG_MANIFEST_URL') or None
+# Cuántos fragmentos de fichas se mantienen en memoria (LRU).
+CATALOG_SHARD_CACHE_SIZE = 32
+
+# Máximo de resultados que devuelve /buscar/ (ordenados por relevancia).
+SEARCH_RESULTS_LIMIT = 100
+# Fracción mínima de trigramas de la búsqueda que debe tener un título para
+# aparecer como resultado aproximado (tolerante a erratas).
+SEARCH_MIN_SIMILARITY = 0.45
+
+# Autocompletado del buscador (/buscar/sugerencias/): máximo de sugerencias por
+# respuesta y cuántos prefijos recientes se guardan en caché.
+SEARCH_SUGGESTIONS_LIMIT = 8
+SEARCH_SUGGESTIONS_CACHE_SIZE = 512
+
+# Caché de páginas HTML (inicio, catálogos, detalle y episodios) por versión del
+# catálogo. Memoria máxima que puede ocupar antes de descartar las menos usadas.
+RESPONSE_CACHE_MAX_BYTES = 32 * 1024 * 1024
+
+# Sitemaps: máximo de URLs por sitemap hijo (el protocolo admite 50.000) y si se
+# incluyen las URLs de cada episodio (solo con el catálogo completo, no fragmentado).
+SITEMAP_MAX_URLS = 50000
+SITEMAP_INCLUDE_EPISODES = False
+
+# Caché de enlaces .m3u8 resueltos (/api/v1/resolve/). Si la URL trae su caducidad
+# (expires, exp o s+e) se usa esa, con RESOLVER_CACHE_MAX_TTL como máximo; si no,
+# RESOLVER_CACHE_TTL. Los fallos se recuerdan RESOLVER_NEGATIVE_TTL segundos.
+RESOLVER_CACHE_TTL = 600
+RESOLVER_CACHE_MAX_TTL = 6 * 3600
+RESOLVER_NEGATIVE_TTL = 30
+RESOLVER_CACHE_SIZE = 1000
+# Segundos que una petición espera a otra idéntica que ya está resolviendo la misma fuente.
+RESOLVER_COALESCE_TIMEOUT = 30
+
+# Carrera de fuentes (/api/v1/resolve-race/): cuántas se resuelven a la vez, el plazo
+# de cada servidor, el plazo total, cuántas candidatas se aceptan y los hilos compartidos.
+RESOLVER_RACE_PARALLELISM = 3
+RESOLVER_SERVER_TIMEOUT = 8
+RESOLVER_RACE_TIMEOUT = 20
+RESOLVER_RACE_MAX_CANDIDATES = 8
+RESOLVER_RACE_WORKERS = 16
+# Cuando una fuente gana, segundos que se espera a las preferidas que aún están resolviendo.
+RESOLVER_RACE_GRACE = 1.5
+
+# Salud de los servidores de vídeo: tras RESOLVER_BREAKER_THRESHOLD fallos seguidos se
+# abre el circuito del host y sus resoluciones fallan al instante durante
+# RESOLVER_BREAKER_COOLDOWN segundos. La puntuación (éxito / (1 + latencia / escala))
+# ordena las candidatas de /api/v1/resolve-race/ (no el HTML cacheado de las páginas);
+# los servidores sin datos cuentan con la puntuación por defecto.
+RESOLVER_BREAKER_THRESHOLD = 5
+RESOLVER_BREAKER_COOLDOWN = 60
+RESOLVER_HEALTH_LATENCY_SCALE = 5
+RESOLVER_HEALTH_DEFAULT_SCORE = 0.6
+
+# Las páginas de los servidores se leen en streaming y se deja de leer al encontrar el
+# .m3u8; como mucho se leen RESOLVER_SCAN_MAX_BYTES bytes por página.
+RESOLVER_SCAN_MAX_BYTES = 2 * 1024 * 1024